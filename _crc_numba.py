@@ -0,0 +1,85 @@
+"""Slice-by-8 CRC32, JIT-compiled with Numba when it is installed.
+
+Last-resort CRC32 backend for interpreters built without zlib (some
+embedded/mobile Python distributions). Same polynomial and output as
+zlib.crc32, so frames stay compatible with every other peer.
+
+Rationale:
+- Slice-by-8 consumes 8 bytes per step with 8 table lookups, the fastest
+  table-driven form; Numba compiles it to native code.
+- Numba is optional: without it the same function runs as plain Python
+  (correct but slow), which still beats refusing to transfer.
+- cache=True persists the compiled code, and a warm-up call at import keeps
+  the JIT cost off the first transfer.
+"""
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # Optional dependency; plain Python below.
+    np = None
+    njit = None
+
+# Reflected CRC-32 polynomial (IEEE 802.3, as used by zlib).
+_POLY = 0xEDB88320
+
+
+def _make_tables() -> list:
+    """Build the 8x256 slice-by-8 lookup tables."""
+    tables = [[0] * 256 for _ in range(8)]
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ (_POLY if crc & 1 else 0)
+        tables[0][i] = crc
+    for i in range(256):
+        crc = tables[0][i]
+        for t in range(1, 8):
+            crc = tables[0][crc & 0xFF] ^ (crc >> 8)
+            tables[t][i] = crc
+    return tables
+
+
+def _crc32_slice_by_8(buf, init, tables):
+    """CRC32 of buf (uint8 sequence) continuing from init; zlib-compatible."""
+    crc = init ^ 0xFFFFFFFF
+    n = len(buf)
+    i = 0
+    # Main loop: fold 8 bytes per iteration.
+    while i + 8 <= n:
+        lo = crc ^ (buf[i] | (buf[i + 1] << 8) | (buf[i + 2] << 16) | (buf[i + 3] << 24))
+        crc = (
+            tables[7][lo & 0xFF]
+            ^ tables[6][(lo >> 8) & 0xFF]
+            ^ tables[5][(lo >> 16) & 0xFF]
+            ^ tables[4][(lo >> 24) & 0xFF]
+            ^ tables[3][buf[i + 4]]
+            ^ tables[2][buf[i + 5]]
+            ^ tables[1][buf[i + 6]]
+            ^ tables[0][buf[i + 7]]
+        )
+        i += 8
+    # Tail: remaining 0-7 bytes one at a time.
+    while i < n:
+        crc = tables[0][(crc ^ buf[i]) & 0xFF] ^ (crc >> 8)
+        i += 1
+    return crc ^ 0xFFFFFFFF
+
+
+if njit is not None:
+    _TABLES = np.array(_make_tables(), dtype=np.uint32)
+    _kernel = njit(cache=True, boundscheck=False)(_crc32_slice_by_8)
+
+    def crc32_slice_by_8(data, init: int = 0) -> int:
+        """Return the CRC32 of data, continuing from init (zlib-compatible)."""
+        buf = np.frombuffer(data, dtype=np.uint8)
+        return int(_kernel(buf, np.uint32(init), _TABLES)) & 0xFFFFFFFF
+
+    # Compile now so the first transfer is not JIT-penalized.
+    crc32_slice_by_8(b"\x00" * 64, 0)
+else:
+    _TABLES = _make_tables()
+
+    def crc32_slice_by_8(data, init: int = 0) -> int:
+        """Return the CRC32 of data, continuing from init (zlib-compatible)."""
+        return _crc32_slice_by_8(memoryview(data).cast("B"), init, _TABLES)
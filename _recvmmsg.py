@@ -0,0 +1,128 @@
+"""Batched UDP receive (recvmmsg) for the discovery socket.
+
+Every peer on the LAN broadcasts a discovery request and answers ours, so a
+busy network delivers bursts of small datagrams. recvmmsg(2) returns up to
+RECV_BATCH of them from one syscall where recvfrom needs one call each.
+
+Rationale:
+- ctypes keeps the project pure Python: no build step, as in _crc32.
+- Linux only (glibc/bionic export recvmmsg); other platforms get None from
+  make_batch_receiver and callers keep their recvfrom_into loop.
+- Buffers, iovecs and address slots are allocated once per receiver and
+  reused for every call; only IPv4 sender addresses are decoded, since
+  discovery binds an AF_INET socket.
+- CDLL (not PyDLL) releases the GIL for the call; MSG_DONTWAIT makes it
+  return at once on an empty queue, as the reactor expects.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import socket
+import sys
+from typing import List, Optional, Tuple
+
+# Datagrams fetched per syscall.
+RECV_BATCH = 16
+# Room for any sockaddr (sizeof(struct sockaddr_storage)).
+_SOCKADDR_SIZE = 128
+# Non-blocking for this call only (Linux value).
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0x40)
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_recvmmsg():
+    """Return libc's recvmmsg via ctypes, or None where unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        func = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    # int recvmmsg(int fd, struct mmsghdr *vec, unsigned vlen, int flags, struct timespec *timeout)
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    func.restype = ctypes.c_int
+    return func
+
+
+_recvmmsg = _load_recvmmsg()
+
+
+class BatchReceiver:
+    """Receives up to RECV_BATCH datagrams per call into reused buffers.
+
+    Reason: Preallocated ctypes structures make each call one foreign
+    function call plus per-datagram slicing; nothing is rebuilt.
+    """
+
+    def __init__(self, packet_size: int, batch: int = RECV_BATCH) -> None:
+        """Allocate batch buffers of packet_size bytes and their headers."""
+        self.buffers = [bytearray(packet_size) for _ in range(batch)]
+        self.views = [memoryview(buffer) for buffer in self.buffers]
+        self._names = (ctypes.c_ubyte * (_SOCKADDR_SIZE * batch))()
+        self._iovecs = (_IOVec * batch)()
+        self._msgs = (_MMsgHdr * batch)()
+        self._batch = batch
+        for i, buffer in enumerate(self.buffers):
+            # Borrow each bytearray's storage; the kernel writes into it.
+            self._iovecs[i].iov_base = ctypes.addressof((ctypes.c_char * packet_size).from_buffer(buffer))
+            self._iovecs[i].iov_len = packet_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._names) + i * _SOCKADDR_SIZE
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+    def receive(self, fd: int) -> List[Tuple[memoryview, str]]:
+        """Return (payload view, sender IP) for each queued datagram.
+
+        Views point into this receiver's buffers and are only valid until
+        the next call. An empty list means the queue is empty.
+
+        Raises:
+            OSError: Socket error (e.g. closed descriptor)
+        """
+        msgs = self._msgs
+        for i in range(self._batch):
+            # The kernel shrinks msg_namelen to the address it wrote.
+            msgs[i].msg_hdr.msg_namelen = _SOCKADDR_SIZE
+        count = _recvmmsg(fd, msgs, self._batch, _MSG_DONTWAIT, None)
+        if count < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, "recvmmsg failed")
+        names = self._names
+        results = []
+        for i in range(count):
+            base = i * _SOCKADDR_SIZE
+            # sockaddr_in: family (2), port (2), IPv4 address (4).
+            ip = socket.inet_ntoa(bytes(names[base + 4 : base + 8]))
+            results.append((self.views[i][: msgs[i].msg_len], ip))
+        return results
+
+
+def make_batch_receiver(packet_size: int) -> Optional[BatchReceiver]:
+    """Return a BatchReceiver, or None where recvmmsg is unavailable."""
+    if _recvmmsg is None:
+        return None
+    return BatchReceiver(packet_size)
@@ -9,7 +9,7 @@ Protocol design:
 - All multi-byte integers use big-endian (network byte order) for cross-platform compatibility
 - Lengths are uint32, sizes are uint64, indices are uint32
 - Filenames are UTF-8 encoded with explicit byte length
-- CRC32 checksums detect corruption during transmission
+- CRC32 checksums detect corruption during transmission (libdeflate when available)
 # Max file size is 5 GB to prevent integer overflow attacks
 - Dynamic length validation prevents memory exhaustion attacks
 
@@ -28,16 +28,20 @@ Frame types:
 - 0x03 = BINARY_FILE_ACK: Optional acknowledgment (future: resume support)
 
 Each binary frame is prefixed with length to enable streaming demultiplexing
-with JSON frames on the same socket. Receiver peeks first byte to route:
+with JSON frames on the same socket. Receiver checks the first payload byte
+to route:
 - 0x42 ('B') → Binary frame
 - 0x7B ('{') → JSON frame (existing protocol)
 """
 
+import binascii
 import struct
-import zlib
-from typing import Optional, Tuple, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Sequence, Tuple, Dict, Any, Union
 import os
 
+from _crc32 import crc32
+
 
 # Magic bytes to identify binary frames (impossible to confuse with JSON).
 # 0x42 0x49 0x4E = ASCII 'BIN', never matches JSON start (0x7B = '{')
@@ -52,13 +56,39 @@ FRAME_TYPE_FILE_ACK = 0x03
 MAX_FILE_SIZE = 5 * 1024 * 1024 * 1024  # 5 GB - prevents uint64 overflow
 MAX_FILENAME_LENGTH = 1024  # Characters, UTF-8 can be up to 4 bytes each
 MAX_CHUNK_SIZE = 10 * 1024 * 1024  # 10 MB - prevents huge memory allocations
-MIN_CHUNK_DATA = 1024  # Must send at least 1 KB of actual data
+MIN_CHUNK_DATA = 1  # Never send empty chunks; a file's last chunk may be short
+MAX_FRAME_LENGTH = 11 * 1024 * 1024  # Largest chunk frame plus header headroom
 
 # Compression flags for optional compression support.
 COMPRESSION_NONE = 0x00
 COMPRESSION_LZ4 = 0x01
 COMPRESSION_GZIP = 0x02
 
+# Chunk checksum modes, advertised in the upper nibble of the meta flags byte.
+# The chunk trailer length (4/2/0 bytes) identifies the mode on the wire.
+CHECKSUM_CRC32 = 0x00  # Default; what every peer understands
+CHECKSUM_CRC16 = 0x01  # CRC-16-CCITT (binascii.crc_hqx, init 0xFFFF)
+CHECKSUM_NONE = 0x02  # Rely on TCP checksums only
+SUPPORTED_CHECKSUMS = (CHECKSUM_CRC32, CHECKSUM_CRC16, CHECKSUM_NONE)
+_TRAILER_SIZE = {CHECKSUM_CRC32: 4, CHECKSUM_CRC16: 2, CHECKSUM_NONE: 0}
+_TRAILER_MODE = {4: CHECKSUM_CRC32, 2: CHECKSUM_CRC16, 0: CHECKSUM_NONE}
+
+# Precompiled frame layouts (length prefix through fixed header fields).
+# Reason: struct.Struct parses the format once instead of on every call.
+_META_FRAME_HEAD = struct.Struct(">I3sB16sQBH")  # length, magic, type, id, size, comp, name_len
+_CHUNK_FRAME_HEAD = struct.Struct(">I3sB16sII")  # length, magic, type, id, index, data_len
+_U32 = struct.Struct(">I")
+_U16 = struct.Struct(">H")
+
+# Per-chunk-size Structs covering index, size, data and trailer in one call.
+# Reason: Built once per (chunk_size, checksum_mode); sessions reuse them.
+_CHUNK_BODY_STRUCTS: Dict[Tuple[int, int], struct.Struct] = {}
+_TRAILER_FORMAT = {CHECKSUM_CRC32: "I", CHECKSUM_CRC16: "H", CHECKSUM_NONE: ""}
+
+# Precompiled header layouts for decoding (frame data after the length prefix).
+_META_HEAD = struct.Struct(">3sB16sQBH")  # magic, type, id, size, comp, name_len (31 bytes)
+_CHUNK_HEAD = struct.Struct(">3sB16sII")  # magic, type, id, index, data_len (28 bytes)
+
 
 class BinaryProtocolError(Exception):
     """Base exception for binary protocol violations.
@@ -68,35 +98,33 @@ class BinaryProtocolError(Exception):
     pass
 
 
-def read_exact(sock, num_bytes: int) -> Optional[bytes]:
-    """Read exactly num_bytes from socket or return None on disconnect.
-    
-    Reason: TCP recv() may return fewer bytes than requested. This loops until
-    we have the exact amount or detect clean disconnect (empty chunk).
+def chunk_checksum(data, checksum_mode: int = CHECKSUM_CRC32) -> int:
+    """Compute the chunk trailer value for the given checksum mode.
     
-    Returns:
-        Bytes if successful, None if connection closed before full read.
-        
-    Raises:
-        OSError: On socket errors (connection reset, timeout, etc.)
+    Reason: CRC-16 and "none" trade detection strength for CPU on peers
+    where the CRC32 fallback is slow; TCP already checksums every segment.
     """
-    chunks = []
-    bytes_read = 0
-    while bytes_read < num_bytes:
-        # Request remaining bytes; may return less due to TCP buffering.
-        chunk = sock.recv(num_bytes - bytes_read)
-        if not chunk:
-            # Empty read signals clean disconnect.
-            return None
-        chunks.append(chunk)
-        bytes_read += len(chunk)
-    # Reassemble all chunks into single contiguous bytestring.
-    return b"".join(chunks)
+    if checksum_mode == CHECKSUM_CRC32:
+        return crc32(data)
+    if checksum_mode == CHECKSUM_CRC16:
+        return binascii.crc_hqx(data, 0xFFFF)
+    return 0
+
+
+def _pack_trailer_into(frame: bytearray, offset: int, checksum_mode: int, value: int) -> None:
+    if checksum_mode == CHECKSUM_CRC32:
+        _U32.pack_into(frame, offset, value)
+    elif checksum_mode == CHECKSUM_CRC16:
+        _U16.pack_into(frame, offset, value)
 
 
 def encode_binary_file_meta(
-    file_id: bytes, filename: str, size: int, compression: int = COMPRESSION_NONE
-) -> bytes:
+    file_id: bytes,
+    filename: str,
+    size: int,
+    compression: int = COMPRESSION_NONE,
+    checksum_mode: int = CHECKSUM_CRC32,
+) -> bytearray:
     """Encode file metadata frame for binary transfer.
     
     Format:
@@ -105,7 +133,8 @@ def encode_binary_file_meta(
     [1 byte]  Frame type (0x01)
     [16 bytes] File ID (UUID as raw bytes, not string)
     [8 bytes]  File size (uint64 big-endian)
-    [1 byte]   Compression flag (0x00=none, 0x01=lz4, 0x02=gzip)
+    [1 byte]   Flags: low nibble compression (0x00=none, 0x01=lz4, 0x02=gzip),
+               high nibble chunk checksum mode (0=crc32, 1=crc16, 2=none)
     [2 bytes]  Filename length in bytes (uint16 big-endian)
     [N bytes]  Filename (UTF-8 encoded)
     [4 bytes]  CRC32 of (type+file_id+size+compression+filename for corruption detection)
@@ -123,9 +152,12 @@ def encode_binary_file_meta(
         filename: Filename to transfer (may contain unicode)
         size: File size in bytes
         compression: Compression flag (COMPRESSION_NONE default)
+        checksum_mode: Checksum the following chunks use (CRC32 default; only
+            pick another mode if the peer advertised it in its handshake)
         
     Returns:
-        Complete frame as bytes, ready to send
+        Complete frame as a bytearray, ready to send (any buffer-accepting
+        socket call takes it without copying)
         
     Raises:
         BinaryProtocolError: If inputs invalid (size too large, filename too long)
@@ -137,6 +169,9 @@ def encode_binary_file_meta(
     if len(file_id) != 16:
         raise BinaryProtocolError(f"File ID must be 16 bytes, got {len(file_id)}")
     
+    if checksum_mode not in _TRAILER_SIZE:
+        raise BinaryProtocolError(f"Unknown checksum mode: {checksum_mode}")
+    
     # Encode filename as UTF-8; check length in bytes, not characters.
     filename_bytes = filename.encode("utf-8")
     if len(filename_bytes) > MAX_FILENAME_LENGTH:
@@ -144,26 +179,44 @@ def encode_binary_file_meta(
             f"Filename too long: {len(filename_bytes)} bytes (max {MAX_FILENAME_LENGTH})"
         )
     
-    # Build payload: frame type + metadata + filename.
-    payload = struct.pack(">B", FRAME_TYPE_FILE_META)  # 1 byte: frame type
-    payload += file_id  # 16 bytes: UUID
-    payload += struct.pack(">Q", size)  # 8 bytes: file size (uint64 big-endian)
-    payload += struct.pack(">B", compression)  # 1 byte: compression flag
-    payload += struct.pack(">H", len(filename_bytes))  # 2 bytes: filename length
-    payload += filename_bytes  # N bytes: actual filename
-    
-    # Compute CRC32 of payload for corruption detection.
-    payload_crc = struct.pack(">I", zlib.crc32(payload) & 0xFFFFFFFF)
-    
-    # Complete frame: magic + payload + crc.
-    frame = BINARY_MAGIC + payload + payload_crc
-    
-    # Prepend 4-byte length for framing (excludes length field itself).
-    frame_length = struct.pack(">I", len(frame))
-    return frame_length + frame
+    # Allocate the whole frame once and pack fields in place.
+    # Reason: Avoids an intermediate bytes object per field.
+    name_len = len(filename_bytes)
+    header_size = _META_FRAME_HEAD.size
+    frame = bytearray(header_size + name_len + 4)
+    _META_FRAME_HEAD.pack_into(
+        frame, 0,
+        len(frame) - 4,  # Frame length (excludes length field itself)
+        BINARY_MAGIC,
+        FRAME_TYPE_FILE_META,
+        file_id,
+        size,
+        (checksum_mode << 4) | compression,
+        name_len,
+    )
+    frame[header_size : header_size + name_len] = filename_bytes
+    
+    # CRC32 covers type + metadata + filename (everything after magic).
+    payload_end = header_size + name_len
+    payload_crc = crc32(memoryview(frame)[7:payload_end])
+    _U32.pack_into(frame, payload_end, payload_crc)
+    return frame
 
 
-def decode_binary_file_meta(data: bytes) -> Tuple[bytes, str, int, int]:
+def _meta_header_error(magic: bytes, frame_type: int, size: int, filename_len: int, checksum_mode: int) -> str:
+    """Describe the first invalid meta header field (cold path only)."""
+    if magic != BINARY_MAGIC:
+        return f"Invalid magic header: {magic.hex()}"
+    if frame_type != FRAME_TYPE_FILE_META:
+        return f"Wrong frame type: {frame_type}, expected {FRAME_TYPE_FILE_META}"
+    if size > MAX_FILE_SIZE:
+        return f"File size too large: {size}"
+    if filename_len > MAX_FILENAME_LENGTH:
+        return f"Filename too long: {filename_len}"
+    return f"Unknown checksum mode: {checksum_mode}"
+
+
+def decode_binary_file_meta(data: bytes) -> Tuple[bytes, str, int, int, int]:
     """Decode file metadata frame (inverse of encode_binary_file_meta).
     
     Rationale: Validates frame against CRC32, sanitizes filename, enforces size limits.
@@ -172,7 +225,7 @@ def decode_binary_file_meta(data: bytes) -> Tuple[bytes, str, int, int]:
         data: Raw frame data (without length prefix)
         
     Returns:
-        Tuple of (file_id, filename, size, compression_flag)
+        Tuple of (file_id, filename, size, compression_flag, checksum_mode)
         
     Raises:
         BinaryProtocolError: If frame invalid, CRC mismatch, or data corrupt
@@ -182,27 +235,26 @@ def decode_binary_file_meta(data: bytes) -> Tuple[bytes, str, int, int]:
     if len(data) < 35:
         raise BinaryProtocolError(f"Frame too short: {len(data)} bytes")
     
-    # Verify magic header to catch protocol confusion.
-    if data[:3] != BINARY_MAGIC:
-        raise BinaryProtocolError(f"Invalid magic header: {data[:3].hex()}")
-    
-    # Extract and verify frame type.
-    frame_type = struct.unpack(">B", data[3:4])[0]
-    if frame_type != FRAME_TYPE_FILE_META:
-        raise BinaryProtocolError(f"Wrong frame type: {frame_type}, expected {FRAME_TYPE_FILE_META}")
-    
-    # Parse fixed-size fields.
-    file_id = data[4:20]  # 16 bytes
-    size = struct.unpack(">Q", data[20:28])[0]  # 8 bytes, uint64
-    compression = struct.unpack(">B", data[28:29])[0]  # 1 byte
-    filename_len = struct.unpack(">H", data[29:31])[0]  # 2 bytes, uint16
-    
-    # Validate sizes to catch attacks.
-    if size > MAX_FILE_SIZE:
-        raise BinaryProtocolError(f"File size too large: {size}")
-    
-    if filename_len > MAX_FILENAME_LENGTH:
-        raise BinaryProtocolError(f"Filename too long: {filename_len}")
+    # View the frame so field slices below reference it instead of copying.
+    view = memoryview(data)
+    
+    # Parse the whole fixed header in one C-level call.
+    magic, frame_type, file_id, size, flags, filename_len = _META_HEAD.unpack_from(view, 0)
+    compression = flags & 0x0F
+    checksum_mode = flags >> 4
+    
+    # Validate every header field with one short-circuit test; the common
+    # (valid) case pays a single branch, diagnostics are built only on failure.
+    if (
+        magic != BINARY_MAGIC
+        or frame_type != FRAME_TYPE_FILE_META
+        or size > MAX_FILE_SIZE
+        or filename_len > MAX_FILENAME_LENGTH
+        or checksum_mode not in _TRAILER_SIZE
+    ):
+        raise BinaryProtocolError(
+            _meta_header_error(magic, frame_type, size, filename_len, checksum_mode)
+        )
     
     # Verify we have enough data for filename + CRC.
     expected_length = 31 + filename_len + 4
@@ -212,12 +264,12 @@ def decode_binary_file_meta(data: bytes) -> Tuple[bytes, str, int, int]:
         )
     
     # Extract filename bytes and CRC.
-    filename_bytes = data[31 : 31 + filename_len]
-    received_crc = struct.unpack(">I", data[31 + filename_len : 31 + filename_len + 4])[0]
+    filename_bytes = view[31 : 31 + filename_len]
+    received_crc = _U32.unpack_from(view, 31 + filename_len)[0]
     
     # Verify CRC32 to detect transmission corruption.
-    payload = data[3 : 31 + filename_len]  # Everything except magic and CRC
-    computed_crc = zlib.crc32(payload) & 0xFFFFFFFF
+    payload = view[3 : 31 + filename_len]  # Everything except magic and CRC
+    computed_crc = crc32(payload)
     if received_crc != computed_crc:
         raise BinaryProtocolError(
             f"CRC mismatch: received {received_crc:08x}, computed {computed_crc:08x}"
@@ -225,14 +277,35 @@ def decode_binary_file_meta(data: bytes) -> Tuple[bytes, str, int, int]:
     
     # Decode filename from UTF-8; may contain emojis, unicode, etc.
     try:
-        filename = filename_bytes.decode("utf-8")
+        filename = str(filename_bytes, "utf-8")
     except UnicodeDecodeError as e:
         raise BinaryProtocolError(f"Invalid UTF-8 filename: {e}")
     
-    return file_id, filename, size, compression
+    return file_id, filename, size, compression, checksum_mode
+
+
+def _check_chunk_args(file_id: bytes, data_len: int, checksum_mode: int = CHECKSUM_CRC32) -> None:
+    """Validate chunk encoder inputs.
+    
+    Raises:
+        BinaryProtocolError: If file_id is not 16 bytes, data_len out of range,
+            or checksum_mode unknown
+    """
+    if checksum_mode not in _TRAILER_SIZE:
+        raise BinaryProtocolError(f"Unknown checksum mode: {checksum_mode}")
+
+    if len(file_id) != 16:
+        raise BinaryProtocolError(f"File ID must be 16 bytes, got {len(file_id)}")
+    
+    if data_len < MIN_CHUNK_DATA or data_len > MAX_CHUNK_SIZE:
+        raise BinaryProtocolError(
+            f"Chunk size {data_len} outside valid range [{MIN_CHUNK_DATA}, {MAX_CHUNK_SIZE}]"
+        )
 
 
-def encode_binary_file_chunk(file_id: bytes, chunk_index: int, data: bytes) -> bytes:
+def encode_binary_file_chunk(
+    file_id: bytes, chunk_index: int, data: bytes, checksum_mode: int = CHECKSUM_CRC32
+) -> bytearray:
     """Encode file chunk frame for binary transfer.
     
     Format:
@@ -244,6 +317,7 @@ def encode_binary_file_chunk(file_id: bytes, chunk_index: int, data: bytes) -> b
     [4 bytes]  Chunk size (uint32 big-endian, actual data length)
     [N bytes]  Raw chunk data (no Base64 encoding!)
     [4 bytes]  CRC32 of chunk data for corruption detection
+               (2-byte CRC-16 or nothing if the meta frame negotiated it)
     
     Rationale:
     - Raw binary data (no Base64) saves 33% bandwidth and CPU
@@ -255,175 +329,329 @@ def encode_binary_file_chunk(file_id: bytes, chunk_index: int, data: bytes) -> b
         file_id: 16-byte UUID (must match metadata)
         chunk_index: Sequential index (0, 1, 2...)
         data: Raw bytes from file (not encoded)
+        checksum_mode: Trailer checksum (must match the meta frame)
         
     Returns:
-        Complete frame as bytes
+        Complete frame as a bytearray, ready to send
         
     Raises:
         BinaryProtocolError: If inputs invalid
     """
     # Validate inputs.
-    if len(file_id) != 16:
-        raise BinaryProtocolError(f"File ID must be 16 bytes, got {len(file_id)}")
-    
-    if len(data) < MIN_CHUNK_DATA or len(data) > MAX_CHUNK_SIZE:
-        raise BinaryProtocolError(
-            f"Chunk size {len(data)} outside valid range [{MIN_CHUNK_DATA}, {MAX_CHUNK_SIZE}]"
-        )
+    _check_chunk_args(file_id, len(data), checksum_mode)
+    
+    # Allocate the whole frame once; data is copied exactly one time.
+    # Reason: Concatenation would copy the (up to 10 MB) chunk repeatedly.
+    data_len = len(data)
+    header_size = _CHUNK_FRAME_HEAD.size
+    frame = bytearray(header_size + data_len + _TRAILER_SIZE[checksum_mode])
+    _CHUNK_FRAME_HEAD.pack_into(
+        frame, 0,
+        len(frame) - 4,  # Frame length (excludes length field itself)
+        BINARY_MAGIC,
+        FRAME_TYPE_FILE_CHUNK,
+        file_id,
+        chunk_index,
+        data_len,
+    )
+    frame[header_size : header_size + data_len] = data
+    
+    # Checksum of data only (most important part).
+    _pack_trailer_into(frame, header_size + data_len, checksum_mode, chunk_checksum(data, checksum_mode))
+    return frame
+
+
+def build_chunk_header(
+    file_id: bytes, chunk_index: int, data_len: int, checksum_mode: int = CHECKSUM_CRC32
+) -> bytes:
+    """Build the 32-byte chunk frame head (length prefix through chunk size).
     
-    # Build frame: type + file_id + index + size + data.
-    payload = struct.pack(">B", FRAME_TYPE_FILE_CHUNK)  # 1 byte
-    payload += file_id  # 16 bytes
-    payload += struct.pack(">I", chunk_index)  # 4 bytes (uint32)
-    payload += struct.pack(">I", len(data))  # 4 bytes (uint32)
-    payload += data  # N bytes of actual file data
+    Reason: The frame length only depends on data_len, so the head can be
+    sent before the payload without copying the payload into a frame.
     
-    # Compute CRC32 of data only (most important part).
-    data_crc = struct.pack(">I", zlib.crc32(data) & 0xFFFFFFFF)
+    Raises:
+        BinaryProtocolError: If inputs invalid
+    """
+    _check_chunk_args(file_id, data_len, checksum_mode)
+    return _CHUNK_FRAME_HEAD.pack(
+        # Frame length (excludes length field, includes the trailer).
+        _CHUNK_FRAME_HEAD.size - 4 + data_len + _TRAILER_SIZE[checksum_mode],
+        BINARY_MAGIC,
+        FRAME_TYPE_FILE_CHUNK,
+        file_id,
+        chunk_index,
+        data_len,
+    )
+
+
+def build_chunk_trailer(checksum: int, checksum_mode: int = CHECKSUM_CRC32) -> bytes:
+    """Build the trailer that closes a chunk frame (4, 2 or 0 bytes)."""
+    if checksum_mode == CHECKSUM_CRC32:
+        return _U32.pack(checksum)
+    if checksum_mode == CHECKSUM_CRC16:
+        return _U16.pack(checksum)
+    return b""
+
+
+def encode_binary_file_chunk_parts(
+    file_id: bytes, chunk_index: int, data: bytes, checksum_mode: int = CHECKSUM_CRC32
+) -> Tuple[bytes, bytes, bytes]:
+    """Encode a chunk frame as (header, data, trailer) without joining them.
     
-    # Complete frame: magic + payload + crc.
-    frame = BINARY_MAGIC + payload + data_crc
+    Reason: Sending the three parts with sendmsg lets the kernel gather the
+    payload straight from the caller's buffer; encode_binary_file_chunk
+    copies up to 10 MB into a new frame first.
     
-    # Prepend frame length.
-    frame_length = struct.pack(">I", len(frame))
-    return frame_length + frame
+    Returns:
+        Tuple of header bytes, the untouched data object, and checksum trailer
+        
+    Raises:
+        BinaryProtocolError: If inputs invalid
+    """
+    header = build_chunk_header(file_id, chunk_index, len(data), checksum_mode)
+    return header, data, build_chunk_trailer(chunk_checksum(data, checksum_mode), checksum_mode)
 
 
-def decode_binary_file_chunk(data: bytes) -> Tuple[bytes, int, int, bytes]:
-    """Decode file chunk frame (inverse of encode_binary_file_chunk).
-    
-    Rationale: Validates all fields, verifies CRC, prevents malformed chunks
-    from corrupting receiver state.
+def make_chunk_encoder(
+    file_id: bytes,
+    chunk_size: int,
+    checksum_mode: int = CHECKSUM_CRC32,
+    as_parts: bool = False,
+) -> Callable[[int, bytes], Union[bytearray, Tuple[bytes, bytes, bytes]]]:
+    """Return an encoder specialized for one transfer's file_id and chunk size.
+    
+    Everything except the chunk index and data is fixed for a session's
+    full-size chunks, so the length prefix, magic, type and file_id are
+    packed once into a preamble and the rest of the frame is written by a
+    single cached Struct. Chunks of any other length (the last one) go
+    through the general encoder, so callers can use the result for all
+    chunks.
     
     Args:
-        data: Raw frame data (without length prefix)
+        file_id: 16-byte UUID (must match metadata)
+        chunk_size: Payload size of every full chunk
+        checksum_mode: Trailer checksum (must match the meta frame)
+        as_parts: Return (header, data, trailer) for scatter-gather sends
+            instead of one joined bytearray
         
     Returns:
-        Tuple of (file_id, chunk_index, chunk_size, chunk_data)
+        encode(chunk_index, data) producing the same bytes as
+        encode_binary_file_chunk / encode_binary_file_chunk_parts
         
     Raises:
-        BinaryProtocolError: If frame invalid or CRC mismatch
+        BinaryProtocolError: If inputs invalid (checked once, up front)
     """
-    # Minimum frame: magic(3) + type(1) + file_id(16) + index(4) + size(4) + crc(4) = 32 bytes
-    if len(data) < 32:
-        raise BinaryProtocolError(f"Frame too short: {len(data)} bytes")
-    
-    # Verify magic.
-    if data[:3] != BINARY_MAGIC:
-        raise BinaryProtocolError(f"Invalid magic header: {data[:3].hex()}")
-    
-    # Extract frame type.
-    frame_type = struct.unpack(">B", data[3:4])[0]
-    if frame_type != FRAME_TYPE_FILE_CHUNK:
-        raise BinaryProtocolError(f"Wrong frame type: {frame_type}, expected {FRAME_TYPE_FILE_CHUNK}")
+    _check_chunk_args(file_id, chunk_size, checksum_mode)
+    trailer_size = _TRAILER_SIZE[checksum_mode]
+    frame_size = _CHUNK_FRAME_HEAD.size + chunk_size + trailer_size
+    # Length prefix + magic + type + file_id: identical for every full chunk.
+    preamble = _U32.pack(frame_size - 4) + BINARY_MAGIC + bytes((FRAME_TYPE_FILE_CHUNK,)) + file_id
+    
+    if as_parts:
+        size_field = _U32.pack(chunk_size)
+        
+        def encode_parts(chunk_index: int, data: bytes) -> Tuple[bytes, bytes, bytes]:
+            if len(data) != chunk_size:
+                return encode_binary_file_chunk_parts(file_id, chunk_index, data, checksum_mode)
+            checksum = chunk_checksum(data, checksum_mode)
+            return preamble + _U32.pack(chunk_index) + size_field, data, build_chunk_trailer(checksum, checksum_mode)
+        
+        return encode_parts
+    
+    key = (chunk_size, checksum_mode)
+    body = _CHUNK_BODY_STRUCTS.get(key)
+    if body is None:
+        body = _CHUNK_BODY_STRUCTS[key] = struct.Struct(f">II{chunk_size}s{_TRAILER_FORMAT[checksum_mode]}")
+    preamble_size = len(preamble)
+    
+    def encode(chunk_index: int, data: bytes) -> bytearray:
+        if len(data) != chunk_size:
+            return encode_binary_file_chunk(file_id, chunk_index, data, checksum_mode)
+        frame = bytearray(frame_size)
+        frame[:preamble_size] = preamble
+        if trailer_size:
+            body.pack_into(frame, preamble_size, chunk_index, chunk_size, data, chunk_checksum(data, checksum_mode))
+        else:
+            body.pack_into(frame, preamble_size, chunk_index, chunk_size, data)
+        return frame
+    
+    return encode
+
+
+def send_buffers(sock, buffers: Sequence[bytes]) -> None:
+    """Send a sequence of buffers as one contiguous byte stream.
     
-    # Parse fixed fields.
-    file_id = data[4:20]  # 16 bytes
-    chunk_index = struct.unpack(">I", data[20:24])[0]  # 4 bytes
-    chunk_size = struct.unpack(">I", data[24:28])[0]  # 4 bytes
+    Reason: sendmsg maps to a single writev, so a frame split across buffers
+    costs one syscall and no userspace join. Partial writes are resumed from
+    the exact byte where the kernel stopped. Platforms without sendmsg
+    (Windows) fall back to sendall per buffer.
     
-    # Validate chunk size.
-    if chunk_size > MAX_CHUNK_SIZE:
-        raise BinaryProtocolError(f"Chunk size too large: {chunk_size}")
+    Callers sharing the socket must hold its send lock for the whole call.
+    """
+    if not hasattr(sock, "sendmsg"):
+        for buffer in buffers:
+            sock.sendall(buffer)
+        return
+    views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+    while views:
+        sent = sock.sendmsg(views)
+        # Drop fully sent buffers, then trim the partially sent one.
+        while views and sent >= views[0].nbytes:
+            sent -= views[0].nbytes
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+
+def _pread_checksum(fd: int, offset: int, length: int, scratch: bytearray, checksum_mode: int) -> int:
+    """Checksum of a file region, read into a reusable scratch buffer.
     
-    # Verify we have complete frame: header + data + crc.
-    expected_length = 28 + chunk_size + 4
-    if len(data) != expected_length:
-        raise BinaryProtocolError(
-            f"Frame size mismatch: {len(data)} bytes, expected {expected_length}"
-        )
+    Reason: The payload itself goes out via sendfile; Python only needs the
+    bytes long enough to checksum them, so one buffer is reused per chunk.
+    """
+    view = memoryview(scratch)[:length]
+    got = 0
+    while got < length:
+        n = os.preadv(fd, [view[got:]], offset + got)
+        if n == 0:
+            raise BinaryProtocolError("File shrank while streaming")
+        got += n
+    return chunk_checksum(view, checksum_mode)
+
+
+def _iter_chunk_checksums(fd: int, size: int, chunk_size: int, checksum_mode: int) -> Iterator[int]:
+    """Yield per-chunk checksums, computing the next one on a side thread.
     
-    # Extract chunk data and CRC.
-    chunk_data = data[28 : 28 + chunk_size]
-    received_crc = struct.unpack(">I", data[28 + chunk_size : 28 + chunk_size + 4])[0]
+    Reason: While chunk N is being written to the socket, chunk N+1 is read
+    and checksummed on another core (preadv and the CRC release the GIL).
+    Two scratch buffers alternate so the in-flight read never clobbers one
+    still being checksummed. CHECKSUM_NONE skips reading entirely.
+    """
+    if checksum_mode == CHECKSUM_NONE:
+        for _ in range(0, size, chunk_size):
+            yield 0
+        return
+    scratch = (bytearray(chunk_size), bytearray(chunk_size))
+    offsets = range(0, size, chunk_size)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = None
+        for i, offset in enumerate(offsets):
+            length = min(chunk_size, size - offset)
+            current = future or pool.submit(_pread_checksum, fd, offset, length, scratch[i & 1], checksum_mode)
+            # Start the next chunk's CRC before handing this one to the sender.
+            next_offset = offset + chunk_size
+            future = None
+            if next_offset < size:
+                future = pool.submit(
+                    _pread_checksum,
+                    fd,
+                    next_offset,
+                    min(chunk_size, size - next_offset),
+                    scratch[(i + 1) & 1],
+                    checksum_mode,
+                )
+            yield current.result()
+
+
+def iter_sendfile_frames(
+    f, file_id: bytes, chunk_size: int, checksum_mode: int = CHECKSUM_CRC32
+) -> Iterator[Tuple[bytes, int, int, bytes]]:
+    """Yield (header, offset, length, trailer) for each chunk frame of f.
     
-    # Verify CRC to detect corruption.
-    computed_crc = zlib.crc32(chunk_data) & 0xFFFFFFFF
-    if received_crc != computed_crc:
-        raise BinaryProtocolError(
-            f"CRC mismatch: received {received_crc:08x}, computed {computed_crc:08x}"
-        )
+    Reason: The payload of each frame is the file range (offset, length),
+    left for the caller to send with socket.sendfile; only the header and
+    checksum trailer are built in Python. Checksums run one chunk ahead.
     
-    return file_id, chunk_index, chunk_size, chunk_data
+    Args:
+        f: File object opened in binary mode (its fd is read with preadv)
+        file_id: 16-byte UUID (must match metadata)
+        chunk_size: Payload bytes per frame (the last frame may be shorter)
+        checksum_mode: Trailer checksum (must match the meta frame)
+        
+    Raises:
+        BinaryProtocolError: If inputs invalid or the file changes size
+        OSError: On file errors
+    """
+    size = os.fstat(f.fileno()).st_size
+    if hasattr(os, "posix_fadvise"):
+        # Both the checksum preadv and sendfile walk the file front to back;
+        # a larger read-ahead window keeps them ahead of the disk.
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    offset = 0
+    checksums = _iter_chunk_checksums(f.fileno(), size, chunk_size, checksum_mode)
+    for chunk_index, checksum in enumerate(checksums):
+        length = min(chunk_size, size - offset)
+        header = build_chunk_header(file_id, chunk_index, length, checksum_mode)
+        trailer = build_chunk_trailer(checksum, checksum_mode)
+        yield header, offset, length, trailer
+        offset += length
 
 
-def read_binary_frame(sock) -> Tuple[int, bytes]:
-    """Read a complete binary frame from socket.
-    
-    Rationale: Handles frame length prefix, validates magic header, ensures
-    complete frame before returning to caller.
+def decode_binary_file_chunk(
+    data: bytes, checksum_mode: Optional[int] = None
+) -> Tuple[bytes, int, int, memoryview]:
+    """Decode file chunk frame (inverse of encode_binary_file_chunk).
     
-    Protocol:
-    1. Read 4-byte length prefix (big-endian)
-    2. Validate length (must be at least 3 bytes for magic)
-    3. Read exact number of bytes for frame
-    4. Validate magic header as sanity check
-    5. Return (frame_type, frame_data including magic and crc)
+    Rationale: Validates all fields, verifies CRC, prevents malformed chunks
+    from corrupting receiver state.
     
+    Args:
+        data: Raw frame data (without length prefix)
+        checksum_mode: Mode announced in the file's meta frame; if given, the
+            trailer must match it (prevents silently dropping the checksum)
+        
     Returns:
-        Tuple of (frame_type, frame_data)
+        Tuple of (file_id, chunk_index, chunk_size, chunk_data). chunk_data is a
+        memoryview into data (no copy): file writes and sends accept it as-is;
+        call .tobytes() only if the chunk must outlive or be detached from data.
         
     Raises:
-        BinaryProtocolError: If frame invalid, truncated, or magic wrong
-        OSError: On socket errors (read may return None on disconnect)
+        BinaryProtocolError: If frame invalid or CRC mismatch
     """
-    # Phase 1: Read length prefix.
-    length_bytes = read_exact(sock, 4)
-    if length_bytes is None:
-        raise BinaryProtocolError("Connection closed while reading frame length")
-    
-    frame_length = struct.unpack(">I", length_bytes)[0]
-    
-    # Sanity check: frame must be at least magic(3) + type(1) = 4 bytes.
-    # Practical max should be under 11 MB (10 MB chunk + overhead).
-    if frame_length < 4 or frame_length > 11 * 1024 * 1024:
-        raise BinaryProtocolError(
-            f"Invalid frame length: {frame_length} (must be 4-11MB)"
-        )
+    # Minimum frame: magic(3) + type(1) + file_id(16) + index(4) + size(4) = 28 bytes
+    # (plus a 0/2/4-byte checksum trailer).
+    if len(data) < 28:
+        raise BinaryProtocolError(f"Frame too short: {len(data)} bytes")
     
-    # Phase 2: Read entire frame.
-    frame_data = read_exact(sock, frame_length)
-    if frame_data is None:
-        raise BinaryProtocolError("Connection closed while reading frame data")
+    # View the frame so the data slice below references it instead of copying.
+    view = memoryview(data)
     
-    # Phase 3: Validate magic header.
-    if not frame_data.startswith(BINARY_MAGIC):
-        raise BinaryProtocolError(f"Invalid binary magic: {frame_data[:3].hex()}")
+    # Parse the whole fixed header in one C-level call.
+    magic, frame_type, file_id, chunk_index, chunk_size = _CHUNK_HEAD.unpack_from(view, 0)
     
-    # Phase 4: Extract and return frame type.
-    frame_type = struct.unpack(">B", frame_data[3:4])[0]
+    # Validate magic, type and size in one test; errors are described lazily.
+    if magic != BINARY_MAGIC or frame_type != FRAME_TYPE_FILE_CHUNK or chunk_size > MAX_CHUNK_SIZE:
+        if magic != BINARY_MAGIC:
+            raise BinaryProtocolError(f"Invalid magic header: {magic.hex()}")
+        if frame_type != FRAME_TYPE_FILE_CHUNK:
+            raise BinaryProtocolError(f"Wrong frame type: {frame_type}, expected {FRAME_TYPE_FILE_CHUNK}")
+        raise BinaryProtocolError(f"Chunk size too large: {chunk_size}")
     
-    return frame_type, frame_data
-
-
-def peek_frame_type(sock) -> Optional[int]:
-    """Peek at incoming frame type without consuming data.
+    # Verify we have complete frame: header + data + checksum trailer.
+    # The trailer length identifies the checksum mode.
+    trailer_mode = _TRAILER_MODE.get(len(data) - 28 - chunk_size)
+    if trailer_mode is None:
+        raise BinaryProtocolError(
+            f"Frame size mismatch: {len(data)} bytes for chunk of {chunk_size}"
+        )
+    if checksum_mode is not None and trailer_mode != checksum_mode:
+        raise BinaryProtocolError(
+            f"Checksum mode mismatch: frame uses {trailer_mode}, expected {checksum_mode}"
+        )
     
-    Rationale: Determines whether next frame is JSON (0x7B) or binary (0x42).
-    Enables protocol detection without rewinding socket (not always possible).
+    # Extract chunk data (zero-copy view).
+    chunk_data = view[28 : 28 + chunk_size]
+    
+    # Verify checksum to detect corruption.
+    if trailer_mode != CHECKSUM_NONE:
+        if trailer_mode == CHECKSUM_CRC32:
+            received_crc = _U32.unpack_from(view, 28 + chunk_size)[0]
+        else:
+            received_crc = _U16.unpack_from(view, 28 + chunk_size)[0]
+        computed_crc = chunk_checksum(chunk_data, trailer_mode)
+        if received_crc != computed_crc:
+            raise BinaryProtocolError(
+                f"CRC mismatch: received {received_crc:08x}, computed {computed_crc:08x}"
+            )
     
-    Returns:
-        First byte of incoming data (0x7B for JSON, 0x42 for binary),
-        or None if connection closed.
-        
-    Note:
-        This peeks using socket.MSG_PEEK flag. On some platforms or
-        configurations, MSG_PEEK may not work (returns None leading to
-        binary read attempt which will fail with clear error).
-    """
-    try:
-        data = sock.recv(1, socket.MSG_PEEK)
-        if not data:
-            return None
-        return data[0]
-    except (OSError, AttributeError):
-        # MSG_PEEK not available or socket error; caller should attempt normal read.
-        return None
-
-
-# Import socket for MSG_PEEK flag (deferred at end to avoid circular imports).
-try:
-    import socket
-except ImportError:
-    # Fallback if socket not available (shouldn't happen in normal Python).
-    pass
+    return file_id, chunk_index, chunk_size, chunk_data
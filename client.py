@@ -6,14 +6,11 @@ ConnectionManager.connect_to(). Kept for backward compatibility.
 Rationale:
 - Initially planned separate client/server modules.
 - Unified into ConnectionManager for simplicity.
+- connect is bound straight to ConnectionManager.connect_to (callers pass
+  the manager first), so no forwarding frame is added per connection.
 """
 
 from connection_manager import ConnectionManager
 
-
-def connect(manager: ConnectionManager, ip: str, port: int) -> None:
-    """Initiate TCP connection to peer.
-    
-    Reason: Wrapper allows future pre-connection hooks (e.g., validation).
-    """
-    manager.connect_to(ip, port)
+# connect(manager, ip, port) -> bool; True once the TCP connection is up.
+connect = ConnectionManager.connect_to
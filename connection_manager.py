@@ -10,153 +10,702 @@ Supports hybrid protocol:
 
 Rationale:
 - Single class (ConnectionManager) owns all peers to enable atomic state updates.
-- Background threads for reads to avoid blocking the main event loop.
+- One selector thread reads every peer socket; callbacks run on a worker pool.
 - Master-relay group design chosen for simplicity and ordering guarantees.
-- Socket write locking prevents concurrent message corruption.
+- A single writer thread per peer serializes socket writes, keeping frame
+  boundaries intact without a send lock.
 - Dual protocol detection routes incoming data to appropriate handler.
-- All socket sends protected by lock to maintain frame boundaries.
 
 Threading model safety:
-- One accept thread (server socket, background)
-- One read thread per peer (background)
-- All socket writes protected by PeerConnection.send_lock (thread-safe)
-- All callbacks execute in peer read threads (async to main cli loop)
-- Dictionary access to self.peers protected by implicit GIL (Python dict is atomic for simple ops)
+- One reactor thread (PeerReactor) accepting on the server socket and
+  reading all peer sockets (no dedicated accept thread)
+- Dispatch pool runs callbacks; each peer's frames are handled serially, in order
+- One writer thread per peer; send() only enqueues (never blocks on the socket)
+- All callbacks execute in dispatch pool threads (async to main cli loop)
+- self.peers is an immutable snapshot swapped on connect/disconnect (copy-on-write);
+  readers never lock, writers serialize on _peers_write_lock
 """
 
+import heapq
 import json
 import os
+import queue
+import selectors
 import socket
-import struct
 import threading
 import time
-from typing import Callable, Dict, Optional, Set, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple, Union
 
-from protocol import encode_message, read_exact
+from protocol import encode_message_parts, json_dumps, json_loads
+from binary_protocol import (
+    CHECKSUM_CRC32,
+    FRAME_TYPE_FILE_CHUNK,
+    FRAME_TYPE_FILE_META,
+    MAX_FRAME_LENGTH,
+    SUPPORTED_CHECKSUMS,
+    BinaryProtocolError,
+    decode_binary_file_chunk,
+    decode_binary_file_meta,
+    iter_sendfile_frames,
+    send_buffers,
+)
+from socket_reader import SocketReader
 from utils import get_device_id, get_device_name, get_platform, get_timestamp
 from file_transfer import FileReceiver, FileSender, sanitize_filename
 from storage import ChatStore
 
 
+# Kernel socket buffers sized to hold one full file chunk (2 MB) plus framing.
+# Reason: sendall of a chunk completes without waiting on the peer's ACKs.
+# Effective sizes are capped by net.core.wmem_max / net.core.rmem_max.
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+# Most frames / bytes one writer pass gathers into a single sendmsg.
+# Reason: Bounds the iovec count (IOV_MAX is 1024; frames have up to 3 parts).
+WRITER_BATCH_FRAMES = 64
+WRITER_BATCH_BYTES = 256 * 1024
+# Outbound bytes queued per peer before bulk producers (send_file) wait.
+MAX_QUEUED_SEND_BYTES = 8 * 1024 * 1024
+# Files at least one page long stream through sendfile; smaller ones are
+# cheaper as a single gathered write.
+SENDFILE_MIN_BYTES = 4096
+# Coalesces a sendfile chunk's header, payload and trailer (Linux only).
+TCP_CORK = getattr(socket, "TCP_CORK", None)
+# Inbound bytes queued for callbacks before a peer's socket stops being read.
+# Reason: Backpressure; a slow handler must not let a peer buffer unbounded data.
+MAX_PENDING_BYTES = 32 * 1024 * 1024
+# Workers running message callbacks (per-peer ordering is still preserved).
+DISPATCH_WORKERS = os.cpu_count() or 4
+
+
+class SendfileSegment:
+    """A file range the peer writer sends with socket.sendfile.
+    
+    Reason: Lets a chunk's payload go page cache -> socket while its header
+    and trailer travel through the same ordered send queue.
+    """
+    __slots__ = ("file", "offset", "length")
+
+    def __init__(self, file, offset: int, length: int) -> None:
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+
+def _frame_size(frame) -> int:
+    """Bytes a queued frame will put on the wire (0 for flush events)."""
+    if isinstance(frame, threading.Event):
+        return 0
+    if isinstance(frame, tuple):
+        return sum(part.length if isinstance(part, SendfileSegment) else len(part) for part in frame)
+    return len(frame)
+
+
+def _socket_buffer_options() -> List[Tuple[int, int]]:
+    """Return the (option, size) socket buffer settings worth applying here.
+    
+    Reason: An explicit SO_SNDBUF/SO_RCVBUF pins the size and turns off
+    Linux buffer autotuning, and the kernel silently caps it at
+    net.core.wmem_max / rmem_max (often ~208 KB). Where the cap is below
+    SOCKET_BUFFER_SIZE the option is skipped, so autotuning (up to the
+    tcp_wmem / tcp_rmem maximum) stays in effect. Without /proc (other
+    platforms) the size is always applied.
+    """
+    options = []
+    for option, limit_name in ((socket.SO_SNDBUF, "wmem_max"), (socket.SO_RCVBUF, "rmem_max")):
+        try:
+            with open(f"/proc/sys/net/core/{limit_name}", "r", encoding="ascii") as f:
+                limit: Optional[int] = int(f.read())
+        except (OSError, ValueError):
+            limit = None
+        if limit is None or limit >= SOCKET_BUFFER_SIZE:
+            options.append((option, SOCKET_BUFFER_SIZE))
+    return options
+
+
+# Resolved once; the sysctl caps do not change under a running client.
+SOCKET_BUFFER_OPTIONS = _socket_buffer_options()
+
+
+def _size_socket_buffers(sock: socket.socket) -> None:
+    """Apply SOCKET_BUFFER_OPTIONS to a socket before connect() or listen().
+    
+    Reason: The TCP window scale is fixed by the SYN, so a larger receive
+    buffer only widens the window if set before the handshake. Accepted
+    sockets inherit the listening socket's sizes.
+    """
+    for option, value in SOCKET_BUFFER_OPTIONS:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, value)
+        except OSError:
+            # Option rejected on this platform/socket; keep the default.
+            pass
+
+
+def _tune_socket(sock: socket.socket) -> None:
+    """Apply latency options to a connected peer socket.
+    
+    Reason: Small JSON control frames must not sit in the kernel waiting on
+    Nagle (up to 40 ms) or delayed ACKs behind file chunks.
+    TCP_QUICKACK is Linux-only; unsupported options are skipped.
+    Buffer sizes are set earlier, by _size_socket_buffers.
+    """
+    options = [
+        (socket.IPPROTO_TCP, getattr(socket, "TCP_NODELAY", None), 1),
+        (socket.IPPROTO_TCP, getattr(socket, "TCP_QUICKACK", None), 1),
+    ]
+    for level, option, value in options:
+        if option is None:
+            continue
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            # Option rejected on this platform/socket; keep the default.
+            pass
+
+
+class PeerReactor:
+    """Single selector thread that accepts and reads all peer sockets.
+    
+    Reason: One thread blocked in select() replaces one blocked thread per
+    peer and the old accept thread: the listening socket is watched too
+    (add_listener). On readiness the reactor does one receive into the
+    peer's buffer, peels every complete frame, and hands them to a worker
+    pool, so slow callbacks never stall socket reads for other peers. Other sockets (discovery's UDP socket)
+    join through add_reader, and periodic work through call_later, so the
+    whole client waits in one select().
+    
+    Thread safety:
+    - Only the reactor thread touches the selector, timers and peer readers
+    - A callback, call or timer that raises is logged and its source dropped
+      (peer detached, reader closed, timer not rerun); the loop carries on
+    - Other threads request changes through call_soon (wakes select())
+    - Each peer's frames are dispatched serially, in arrival order
+    """
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._pool = ThreadPoolExecutor(max_workers=DISPATCH_WORKERS)
+        self._calls: deque = deque()
+        # Self-pipe: a byte on _wake_send interrupts select() for call_soon.
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ, None)
+        # Min-heap of (monotonic deadline, sequence, fn, args); reactor thread only.
+        self._timers: List[Tuple[float, int, Callable, tuple]] = []
+        self._timer_seq = 0
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self._wake()
+
+    def call_soon(self, fn: Callable, *args) -> None:
+        """Run fn(*args) on the reactor thread. Thread-safe."""
+        self._calls.append((fn, args))
+        self._wake()
+
+    def add_peer(self, peer: "PeerConnection") -> None:
+        self.call_soon(self._register, peer)
+
+    def remove_peer(self, peer: "PeerConnection") -> None:
+        self.call_soon(self._detach, peer)
+
+    def call_later(self, delay: float, fn: Callable, *args) -> None:
+        """Run fn(*args) on the reactor thread after delay seconds. Thread-safe."""
+        self.call_soon(self._schedule, time.monotonic() + delay, fn, args)
+
+    def add_reader(self, sock: socket.socket, on_readable: Callable[[], None]) -> None:
+        """Call on_readable() on the reactor thread whenever sock is readable.
+        
+        Reason: Lets other services share this select() instead of keeping
+        a thread per socket. The callback must not block.
+        
+        Args:
+            sock: Socket to watch; switched to non-blocking
+        """
+        sock.setblocking(False)
+        self.call_soon(self._selector.register, sock, selectors.EVENT_READ, on_readable)
+
+    def remove_reader(self, sock: socket.socket) -> None:
+        """Stop watching sock and close it (on the reactor thread)."""
+        self.call_soon(self._close_reader, sock)
+
+    def add_listener(self, sock: socket.socket, on_accept: Callable[[socket.socket], None]) -> None:
+        """Accept connections on a listening socket from the reactor thread.
+        
+        Args:
+            sock: Bound, listening socket; switched to non-blocking
+            on_accept: Called on the reactor thread with each new socket
+        """
+        self.add_reader(sock, lambda: self._accept_ready(sock, on_accept))
+
+    def remove_listener(self, sock: socket.socket) -> None:
+        """Stop accepting on sock and close it (on the reactor thread)."""
+        self.remove_reader(sock)
+
+    def _wake(self) -> None:
+        try:
+            self._wake_send.send(b"\x00")
+        except OSError:
+            # Buffer full (a wakeup is already pending) or reactor shut down.
+            pass
+
+    def _loop(self) -> None:
+        timers = self._timers
+        while self.running:
+            # Sleep until the next timer is due, or indefinitely without one.
+            timeout = max(0.0, timers[0][0] - time.monotonic()) if timers else None
+            for key, _mask in self._selector.select(timeout):
+                data = key.data
+                if data is None:
+                    self._drain_wakeups()
+                elif isinstance(data, PeerConnection):
+                    if not self._guarded(self._on_readable, (data,)):
+                        # Drop the peer whose input broke the reader.
+                        self._guarded(self._detach, (data,))
+                elif not self._guarded(data, ()):
+                    # Listener or add_reader socket (data is its callback):
+                    # stop watching a source whose callback failed.
+                    self._guarded(self._close_reader, (key.fileobj,))
+            while self._calls:
+                fn, args = self._calls.popleft()
+                self._guarded(fn, args)
+            now = time.monotonic()
+            while timers and timers[0][0] <= now:
+                _deadline, _seq, fn, args = heapq.heappop(timers)
+                # A failing timer is not rescheduled; it is dropped.
+                self._guarded(fn, args)
+
+    def _guarded(self, fn: Callable, args: tuple) -> bool:
+        """Run fn(*args); log and return False if it raises.
+        
+        Reason: Every peer and discovery share this one thread, so an error
+        from any callback, call or timer must not end the loop.
+        """
+        try:
+            fn(*args)
+            return True
+        except Exception as e:
+            print(f"[reactor error] {getattr(fn, '__qualname__', fn)}: {e!r}")
+            return False
+
+    def _schedule(self, deadline: float, fn: Callable, args: tuple) -> None:
+        # Sequence number keeps heap order total (functions don't compare).
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (deadline, self._timer_seq, fn, args))
+
+    def _drain_wakeups(self) -> None:
+        try:
+            while self._wake_recv.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _accept_ready(self, sock: socket.socket, on_accept: Callable[[socket.socket], None]) -> None:
+        """Accept every pending connection, then return to select()."""
+        while True:
+            try:
+                client_sock, _ = sock.accept()
+            except BlockingIOError:
+                return
+            except OSError as e:
+                # Aborted handshake or fd exhaustion; retry on next readiness.
+                print(f"[accept error] {e}")
+                return
+            # accept() hands back a blocking socket (no default timeout set).
+            on_accept(client_sock)
+
+    def _close_reader(self, sock: socket.socket) -> None:
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+
+    def _register(self, peer: "PeerConnection") -> None:
+        if peer.detached:
+            return
+        try:
+            self._selector.register(peer.sock, selectors.EVENT_READ, peer)
+        except (KeyError, ValueError, OSError):
+            # Socket closed before it could be watched.
+            self._detach(peer)
+
+    def _on_readable(self, peer: "PeerConnection") -> None:
+        try:
+            alive = peer.reader.receive_once()
+        except OSError:
+            # Remote closed/reset the connection abruptly.
+            alive = False
+        except ValueError as e:
+            # Reader buffer cap hit; the peer is flooding unparsed bytes.
+            print(f"[protocol error] {e}")
+            alive = False
+        # Peel every complete frame now buffered (often several per receive).
+        if alive:
+            try:
+                for frame in peer.reader.iter_frames(MAX_FRAME_LENGTH):
+                    self._dispatch(peer, frame)
+            except ValueError as e:
+                print(f"[protocol error] {e}")
+                alive = False
+        if not alive:
+            self._detach(peer)
+        elif peer.pending_bytes + peer.reader.held_bytes > MAX_PENDING_BYTES and not peer.paused:
+            # Handlers are behind: stop reading until the inbox drains.
+            # Reader memory counts too; it is capped well below the limit,
+            # so a pause always leaves queued frames whose drain resumes it.
+            peer.paused = True
+            self._selector.unregister(peer.sock)
+
+    def _detach(self, peer: "PeerConnection") -> None:
+        """Stop watching a peer, release its socket, queue its disconnect."""
+        if peer.detached:
+            return
+        peer.detached = True
+        peer.running = False
+        try:
+            self._selector.unregister(peer.sock)
+        except (KeyError, ValueError):
+            # Never registered, or unregistered while paused.
+            pass
+        # Release reader buffers from the thread that owns them.
+        peer.reader.close()
+        try:
+            peer.sock.close()
+        except OSError:
+            pass
+        # Disconnect is delivered after any frames still queued.
+        self._dispatch(peer, None)
+
+    def _dispatch(self, peer: "PeerConnection", frame: Optional[bytearray]) -> None:
+        with peer.inbox_lock:
+            peer.inbox.append(frame)
+            if frame is not None:
+                peer.pending_bytes += len(frame)
+            if peer.draining:
+                return
+            peer.draining = True
+        self._pool.submit(self._drain, peer)
+
+    def _drain(self, peer: "PeerConnection") -> None:
+        """Handle a peer's queued frames in order (dispatch pool thread)."""
+        while True:
+            with peer.inbox_lock:
+                if not peer.inbox:
+                    peer.draining = False
+                    return
+                frame = peer.inbox.popleft()
+                if frame is not None:
+                    peer.pending_bytes -= len(frame)
+                resume = peer.paused and peer.pending_bytes <= MAX_PENDING_BYTES // 2
+                if resume:
+                    peer.paused = False
+            if resume:
+                self.call_soon(self._register, peer)
+            if frame is None:
+                # Always notify manager of disconnect for cleanup.
+                peer.on_disconnect(peer)
+                continue
+            if peer.failed:
+                continue
+            try:
+                ok = peer.handle_frame(frame)
+            except OSError:
+                # Reply to a dead socket; the reactor sees the disconnect.
+                continue
+            except Exception as e:
+                # Keep draining; one bad frame must not wedge this peer.
+                print(f"[handler error] {e}")
+                continue
+            if not ok:
+                peer.failed = True
+                self.call_soon(self._detach, peer)
+
+
 class PeerConnection:
-    """Wraps a TCP socket and handles inbound reads on a background thread.
+    """Wraps a TCP socket; inbound frames arrive via the shared PeerReactor.
     
     Reason: Isolates per-peer I/O from manager logic; simplifies disconnect cleanup.
-    Each peer gets a dedicated thread to avoid head-of-line blocking if one peer stalls.
+    Frames are queued per peer and dispatched serially, so a stalled handler
+    for one peer never blocks reads or handlers for others.
     
     Thread safety:
-    - send_lock protects all socket writes (JSON and binary)
-    - Ensures frame boundaries not corrupted by concurrent sends
-    - Read loop runs in dedicated thread, not shared
+    - send() only enqueues; one writer thread per peer performs all socket writes
+    - Each send() queues a whole frame, so frame boundaries are never corrupted
+    - reader is only touched by the reactor thread
+    - inbox_lock guards the inbound frame queue shared with the dispatch pool
     """
     def __init__(
         self,
         sock: socket.socket,
-        on_message: Callable[["PeerConnection", Dict], None],
+        on_message: Callable[["PeerConnection", Dict, bytearray], None],
         on_binary: Callable[["PeerConnection", int, bytes], None],
         on_disconnect: Callable[["PeerConnection"], None],
         is_outbound: bool,
+        reactor: "PeerReactor",
     ) -> None:
         self.sock = sock
+        self.reactor = reactor
         self.on_message = on_message
         self.on_binary = on_binary
         self.on_disconnect = on_disconnect
         self.is_outbound = is_outbound
-        self.thread: Optional[threading.Thread] = None
         self.device_id: Optional[str] = None
         self.device_name: Optional[str] = None
         self.platform: Optional[str] = None
+        # Chunk checksum modes the peer accepts (from its handshake).
+        # Reason: Peers predating negotiation only understand CRC32.
+        self.checksum_modes: Tuple[int, ...] = (CHECKSUM_CRC32,)
         self.running = False
-        # Lock protects all socket writes from concurrent corruption.
-        # Reason: Multiple threads (CLI + file send + group relay) may call send simultaneously.
-        self.send_lock = threading.Lock()
+        # Outbound frames: (frame, nbytes) pairs, drained by the writer thread.
+        # Reason: Multiple threads (CLI + file send + group relay) send at once;
+        # a single writer owns the socket, so producers never contend on it.
+        self._send_q: "queue.SimpleQueue[Optional[Tuple[Any, int]]]" = queue.SimpleQueue()
+        self._send_cond = threading.Condition()
+        self._queued_bytes = 0
+        self._writer: Optional[threading.Thread] = None
+        self._writer_stopped = False
+        self.write_failed = False  # Socket write error; further frames dropped.
+        # Buffered reader used only by the reactor thread.
+        self.reader = SocketReader(sock)
+        # Inbound frames awaiting dispatch (None marks the disconnect).
+        self.inbox: deque = deque()
+        self.inbox_lock = threading.Lock()
+        self.pending_bytes = 0
+        self.draining = False  # A dispatch worker is processing the inbox.
+        self.paused = False  # Socket unregistered for backpressure.
+        self.detached = False  # Reactor has released the socket (reactor thread only).
+        self.failed = False  # Protocol error; drop remaining frames.
+        # File IDs this peer is sending us (touched by its dispatch worker only).
+        self.file_ids: Set[bytes] = set()
 
     def start(self) -> None:
-        """Spawn background thread to read messages from this peer.
-        
-        Daemon thread means it terminates when main exits; no cleanup needed.
-        """
+        """Start the writer thread and register this peer with the reactor."""
         self.running = True
-        self.thread = threading.Thread(target=self._read_loop, daemon=True)
-        self.thread.start()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+        self.reactor.add_peer(self)
 
-    def send(self, message: Union[Dict, bytes]) -> None:
-        """Encode and send a message or binary data. Thread-safe.
+    def send(self, message: Union[Dict, bytes, Tuple[Any, ...], threading.Event]) -> None:
+        """Queue a message or binary frame for the writer thread. Thread-safe.
         
-        Reason: sendall ensures atomic delivery; partial writes auto-retried.
-        Lock prevents concurrent sends from interleaving (protecting frame boundaries).
+        Reason: Never blocks on the socket, so the CLI thread and group
+        relays are not stalled by a slow peer. Each call enqueues one whole
+        frame, so frames from concurrent producers never interleave.
+        Frames to a peer whose connection failed are dropped.
         
         Args:
-            message: Either JSON dict or binary bytes (from binary_protocol)
+            message: JSON dict (encoded here, on the caller's thread), binary
+                bytes, a tuple of buffers / SendfileSegments forming one frame,
+                or a threading.Event set once everything queued before it was
+                written (or dropped after a failure)
         """
-        # Determine format: JSON dict or binary bytes.
         if isinstance(message, dict):
-            # JSON message: encode with length prefix.
-            payload = encode_message(message)
-        else:
-            # Binary data: already framed by binary_protocol (includes length).
-            payload = message
+            # JSON message: length prefix and body go out in one sendmsg.
+            message = encode_message_parts(message)
+        nbytes = _frame_size(message)
+        with self._send_cond:
+            if self._writer_stopped:
+                # Connection closed: drop the frame, release any flush waiter.
+                if isinstance(message, threading.Event):
+                    message.set()
+                return
+            self._queued_bytes += nbytes
+            self._send_q.put((message, nbytes))
+
+    def wait_for_capacity(self, limit: int = MAX_QUEUED_SEND_BYTES) -> None:
+        """Block until at most limit bytes are queued for this peer.
         
-        # Atomic send: no other thread can send between lock and sendall.
-        # Reason: Prevents two messages' bytes interleaving on socket.
-        with self.send_lock:
-            self.sock.sendall(payload)
+        Reason: Backpressure for bulk producers (file sends); control
+        messages use send() alone and never wait.
+        """
+        with self._send_cond:
+            self._send_cond.wait_for(lambda: self._queued_bytes <= limit or self._writer_stopped)
 
-    def close(self) -> None:
-        self.running = False
-        try:
-            self.sock.shutdown(socket.SHUT_RDWR)
-        except OSError:
-            pass
-        try:
-            self.sock.close()
-        except OSError:
-            pass
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has left the writer.
+        
+        Returns:
+            True once the queue drained (written or dropped), False on timeout
+        """
+        done = threading.Event()
+        self.send(done)
+        return done.wait(timeout)
 
-    def _read_loop(self) -> None:
-        """Continuously read messages (JSON or binary) until disconnect.
+    def _writer_loop(self) -> None:
+        """Drain the send queue, coalescing queued frames into gathered writes.
         
-        Reason: Blocking read is fine; each peer has its own thread.
-        All frames are length-prefixed, so we read the length first, then
-        route based on payload prefix ('{' for JSON, 'BIN' for binary).
+        Reason: Sole owner of socket writes (no send lock). Whatever queued
+        while the previous write was in flight goes out in one sendmsg, up
+        to WRITER_BATCH_FRAMES / WRITER_BATCH_BYTES.
         """
         try:
-            while self.running:
-                length_bytes = read_exact(self.sock, 4)
-                if not length_bytes:
+            self._write_until_closed()
+        finally:
+            self._stop_writer()
+
+    def _write_until_closed(self) -> None:
+        while True:
+            item = self._send_q.get()
+            if item is None:
+                return
+            batch = [item]
+            batch_bytes = item[1]
+            stop = False
+            while len(batch) < WRITER_BATCH_FRAMES and batch_bytes < WRITER_BATCH_BYTES:
+                try:
+                    item = self._send_q.get_nowait()
+                except queue.Empty:
                     break
-                length = struct.unpack(">I", length_bytes)[0]
-                if length <= 0:
-                    print("[unknown frame type] 0x0")
+                if item is None:
+                    stop = True
                     break
-                payload = read_exact(self.sock, length)
-                if payload is None:
+                batch.append(item)
+                batch_bytes += item[1]
+            self._write_batch(batch)
+            with self._send_cond:
+                self._queued_bytes -= batch_bytes
+                self._send_cond.notify_all()
+            if stop:
+                return
+
+    def _stop_writer(self) -> None:
+        """Refuse further frames and release anyone waiting on the queue."""
+        with self._send_cond:
+            self._writer_stopped = True
+            while True:
+                try:
+                    item = self._send_q.get_nowait()
+                except queue.Empty:
                     break
-                if not payload:
-                    continue
-
-                first_byte = payload[0]
-                if first_byte == 0x7B:  # '{' → JSON message
-                    try:
-                        message = json.loads(payload.decode("utf-8"))
-                    except json.JSONDecodeError:
-                        print("[protocol error] invalid json payload")
-                        break
-                    self.on_message(self, message)
-                elif payload.startswith(b"BIN"):
-                    frame_type = payload[3]
-                    self.on_binary(self, frame_type, payload)
+                if item is not None and isinstance(item[0], threading.Event):
+                    item[0].set()
+            self._queued_bytes = 0
+            self._send_cond.notify_all()
+
+    def _write_batch(self, batch: List[Tuple[Any, int]]) -> None:
+        """Write one batch of queued frames in order; flush events fire in place.
+        
+        Reason: A sendfile chunk goes out as header write, sendfile, trailer
+        write. With TCP_NODELAY each would leave as its own packet, so the
+        socket is corked (Linux) while such chunks are written and uncorked
+        at the end of the batch, which sends the tail immediately.
+        """
+        buffers: List[Any] = []
+        corked = False
+        for frame, _nbytes in batch:
+            if isinstance(frame, threading.Event):
+                self._write_buffers(buffers)
+                if corked:
+                    corked = self._set_cork(False)
+                frame.set()
+                continue
+            for part in frame if isinstance(frame, tuple) else (frame,):
+                if isinstance(part, SendfileSegment):
+                    if not corked:
+                        corked = self._set_cork(True)
+                    # Flush what precedes the payload, then let the kernel copy it.
+                    self._write_buffers(buffers)
+                    if not self.write_failed:
+                        try:
+                            self.sock.sendfile(part.file, part.offset, part.length)
+                        except OSError:
+                            self._fail_writes()
                 else:
-                    print(f"[unknown frame type] {hex(first_byte)}")
-                    break
+                    buffers.append(part)
+        self._write_buffers(buffers)
+        if corked:
+            self._set_cork(False)
+
+    def _set_cork(self, on: bool) -> bool:
+        """Set TCP_CORK; return whether the socket is now corked.
         
+        Reason: Linux-only; elsewhere (or on error) writes stay uncorked.
+        """
+        if TCP_CORK is None or self.write_failed:
+            return False
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK, 1 if on else 0)
+        except OSError:
+            return False
+        return on
+
+    def _write_buffers(self, buffers: List[Any]) -> None:
+        """Send and clear buffers; after a write failure just drop them."""
+        if buffers and not self.write_failed:
+            try:
+                send_buffers(self.sock, buffers)
+            except OSError:
+                self._fail_writes()
+        buffers.clear()
+
+    def _fail_writes(self) -> None:
+        """Stop writing after a socket error and let the reactor tear down."""
+        self.write_failed = True
+        try:
+            # Reading side sees EOF, so the reactor detaches and reports it.
+            self.sock.shutdown(socket.SHUT_RDWR)
         except OSError:
-            # Remote closed/reset the connection abruptly.
-            # Reason: Prevents crash, allows graceful cleanup.
             pass
+
+    def close(self) -> None:
+        """Shut the connection down; the reactor closes the socket.
+        
+        Reason: The socket must leave the selector before its fd is closed,
+        otherwise a reused fd number could collide with the stale entry.
+        """
+        self.running = False
+        # Stop the writer once it drains what is already queued.
+        self._send_q.put(None)
+        with self._send_cond:
+            self._send_cond.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reactor.remove_peer(self)
+
+    def handle_frame(self, payload: bytearray) -> bool:
+        """Route one inbound frame payload (JSON or binary) to the manager.
         
-        # Always notify manager of disconnect for cleanup.
-        self.on_disconnect(self)
+        Reason: All frames are length-prefixed; the reactor strips the
+        length and this routes on the first payload byte alone ('{' for
+        JSON, 'B' for binary). The full 'BIN' magic is verified by the
+        binary_protocol decoders, which parse the header anyway.
+        
+        Returns:
+            False on a protocol violation (caller drops the connection)
+        """
+        if not payload:
+            print("[unknown frame type] 0x0")
+            return False
+        first_byte = payload[0]
+        if first_byte == 0x7B:  # '{' → JSON message
+            try:
+                message = json_loads(payload)
+            except json.JSONDecodeError:
+                print("[protocol error] invalid json payload")
+                return False
+            # Raw payload rides along so relays can forward it unencoded.
+            self.on_message(self, message, payload)
+        elif first_byte == 0x42 and len(payload) >= 4:  # 'B' → binary frame
+            self.on_binary(self, payload[3], payload)
+        else:
+            print(f"[unknown frame type] {hex(first_byte)}")
+            return False
+        return True
 
     def _handle_binary_frame(self, frame_type: int, frame_data: bytes) -> None:
         """Route incoming binary frames to manager."""
@@ -170,9 +719,10 @@ class ConnectionManager:
     Reason: Simplifies synchronization; all peer state in one place.
     
     Threading model:
-    - One accept thread (server).
-    - One read thread per peer.
-    - Callbacks execute in peer threads; must be thread-safe.
+    - One reactor thread accepts inbound connections and reads all peers;
+      callbacks run in its dispatch pool.
+    - One writer thread per peer performs that peer's socket writes.
+    - Callbacks must be thread-safe; self.peers is a lock-free snapshot.
     """
     def __init__(
         self,
@@ -195,11 +745,45 @@ class ConnectionManager:
         self.on_peer_connected = on_peer_connected
         self.on_peer_disconnected = on_peer_disconnected
         self.store = store
+        # Identity is fixed for the process; resolve it once, not per message.
+        self._device_id = get_device_id()
+        self._envelope_template = {
+            "device_id": self._device_id,
+            "device_name": get_device_name(),
+            "platform": get_platform(),
+        }
+        # Handshake JSON up to its timestamp value; only the timestamp varies.
+        self._handshake_prefix = json_dumps({
+            "type": "handshake",
+            **self._envelope_template,
+            # Advertise chunk checksum modes we can verify (binary_protocol).
+            "checksums": list(SUPPORTED_CHECKSUMS),
+        })[:-1] + b',"timestamp":'
         self.server_sock: Optional[socket.socket] = None
-        self.server_thread: Optional[threading.Thread] = None
         self.running = False
-        self.peers: Dict[str, PeerConnection] = {}
+        # Read-only snapshot, replaced wholesale on connect/disconnect.
+        self._peers_snapshot: Mapping[str, PeerConnection] = MappingProxyType({})
+        self._peers_write_lock = threading.Lock()
+        # group_id -> (peers snapshot, member set, connected member peers).
+        # Reason: Both sources are replaced, never mutated, on change, so an
+        # identity check validates an entry; no invalidation hooks needed.
+        self._recipients_cache: Dict[str, Tuple[Mapping, FrozenSet[str], Tuple[PeerConnection, ...]]] = {}
+        # group_id -> (announced state, encoded group_master frame).
+        self._master_frames: Dict[str, Tuple[Tuple, Tuple[bytes, bytes]]] = {}
         self.file_receivers: Dict[str, FileReceiver] = {}
+        # Inbound message type -> handler(peer, message, raw).
+        self._msg_dispatch: Dict[str, Callable[[PeerConnection, Dict, Optional[bytearray]], None]] = {
+            "handshake": self._on_handshake,
+            "message": self._on_direct_message,
+            "group_master": self._on_group_master,
+            "group_invite": self._on_group_invite,
+            "group_join": self._on_group_join,
+            "group_join_ack": self._on_group_join_ack,
+            "group_join_reject": self._on_group_join_reject,
+            "group_message": self._on_group_message,
+        }
+        # Single reader thread for all peer sockets.
+        self.reactor = PeerReactor()
 
     def start_server(self) -> None:
         """Bind TCP server and start accepting inbound connections.
@@ -210,20 +794,25 @@ class ConnectionManager:
         if self.running:
             return
         self.running = True
+        self.reactor.start()
         self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         # Allow reuse of address for quick restarts during development.
         self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_sock.bind(("", self.tcp_port))  # Bind to all interfaces.
+        # Before listen(): accepted sockets inherit the buffer sizes.
+        _size_socket_buffers(self.server_sock)
         self.server_sock.listen(5)  # Backlog for concurrent handshakes.
-        self.server_thread = threading.Thread(target=self._accept_loop, daemon=True)
-        self.server_thread.start()
+        # Accepts run on the reactor thread; no dedicated accept thread.
+        self.reactor.add_listener(self.server_sock, self._on_accept)
 
     def stop(self) -> None:
         self.running = False
         if self.server_sock:
-            self.server_sock.close()
-        for peer in list(self.peers.values()):
+            # The reactor unregisters then closes it.
+            self.reactor.remove_listener(self.server_sock)
+        for peer in self.peers.values():
             peer.close()
+        self.reactor.stop()
 
     def connect_to(self, ip: str, port: int) -> bool:
         """Initiate outbound TCP connection to a peer.
@@ -232,6 +821,7 @@ class ConnectionManager:
         Returns bool so caller can display error without crashing.
         """
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        _size_socket_buffers(sock)
         # 5 second timeout for connect to fail fast on bad IPs.
         sock.settimeout(5)
         try:
@@ -242,11 +832,43 @@ class ConnectionManager:
             return False
         # Clear timeout for normal operation; reads are blocking.
         sock.settimeout(None)
-        peer = PeerConnection(sock, self._handle_message, self._handle_binary_frame, self._handle_disconnect, True)
-        peer.start()  # Spawn read thread.
+        _tune_socket(sock)
+        self.reactor.start()
+        peer = PeerConnection(
+            sock, self._handle_message, self._handle_binary_frame, self._handle_disconnect, True, self.reactor
+        )
+        peer.start()  # Register with the reactor.
         self._send_handshake(peer)  # Initiate protocol handshake.
         return True
 
+    @property
+    def peers(self) -> Mapping[str, PeerConnection]:
+        """Current connected peers by device id (immutable snapshot).
+        
+        Reason: Readers on any thread take no lock; a snapshot never changes
+        underneath an iteration, so relays cannot hit "dict changed size".
+        """
+        return self._peers_snapshot
+
+    def _add_peer(self, peer_id: str, peer: PeerConnection) -> None:
+        """Publish peer under peer_id by swapping in a new snapshot."""
+        with self._peers_write_lock:
+            self._peers_snapshot = MappingProxyType({**self._peers_snapshot, peer_id: peer})
+
+    def _remove_peer(self, peer: PeerConnection) -> bool:
+        """Drop peer from the snapshot; return False if it was not registered.
+        
+        Reason: Compares identity so a stale disconnect cannot evict a newer
+        connection that re-registered under the same device id.
+        """
+        with self._peers_write_lock:
+            if self._peers_snapshot.get(peer.device_id) is not peer:
+                return False
+            peers = dict(self._peers_snapshot)
+            del peers[peer.device_id]
+            self._peers_snapshot = MappingProxyType(peers)
+        return True
+
     def get_peers(self) -> Dict[str, PeerConnection]:
         return dict(self.peers)
 
@@ -260,59 +882,80 @@ class ConnectionManager:
         if not peer:
             # Peer not connected; silently drop (could notify UI layer).
             return
-        message = {
-            "type": "message",
-            "device_id": get_device_id(),
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "timestamp": get_timestamp(),
-            "payload": {"message_id": self._new_message_id(), "text": text},
-        }
+        message = self._envelope("message", {"message_id": self._new_message_id(), "text": text})
         peer.send(message)  # Send over TCP.
         # Store locally; receiver also stores it for their own history.
         self.store.append_direct(peer_id, message)
 
-    def send_file(self, peer_id: str, path: str) -> None:
+    def send_file(self, peer_id: str, path: str, checksum_mode: int = CHECKSUM_CRC32) -> None:
+        """Stream a file to a peer as binary frames.
+        
+        Args:
+            checksum_mode: Requested chunk checksum; used only if the peer
+                advertised it in its handshake, CRC32 otherwise
+        """
         peer = self.peers.get(peer_id)
         if not peer:
             return
-        sender = FileSender(path)
+        if checksum_mode not in peer.checksum_modes:
+            # Peer never advertised this mode; CRC32 is always understood.
+            checksum_mode = CHECKSUM_CRC32
+        sender = FileSender(path, checksum_mode=checksum_mode)
         file_size = os.path.getsize(path)
         bytes_sent = 0
         start_time = time.time()
         chunk_count = 0
-        for message in sender.messages():
-            if isinstance(message, dict):
-                message.update(
-                    {
-                        "device_id": get_device_id(),
-                        "device_name": get_device_name(),
-                        "platform": get_platform(),
-                        "timestamp": get_timestamp(),
-                    }
-                )
-                peer.send(message)
-            else:
-                # Binary frames already encoded; send as-is.
-                peer.send(message)
-                bytes_sent += len(message)
-                chunk_count += 1
-                if chunk_count % 10 == 0:
-                    elapsed = time.time() - start_time
-                    rate = (bytes_sent / (1024 * 1024)) / elapsed if elapsed > 0 else 0
-                    print(f"\n[file send] {bytes_sent / (1024 * 1024):.2f} MB in {elapsed:.2f}s ({rate:.2f} MB/s)")
+
+        def report(frame_bytes: int) -> None:
+            # Progress line every 10 chunk frames.
+            nonlocal bytes_sent, chunk_count
+            bytes_sent += frame_bytes
+            chunk_count += 1
+            if chunk_count % 10 == 0:
+                elapsed = time.time() - start_time
+                rate = (bytes_sent / (1024 * 1024)) / elapsed if elapsed > 0 else 0
+                print(f"\n[file send] {bytes_sent / (1024 * 1024):.2f} MB in {elapsed:.2f}s ({rate:.2f} MB/s)")
+
+        if file_size >= SENDFILE_MIN_BYTES and hasattr(os, "preadv"):
+            # Zero-copy path: payload goes page cache -> socket via sendfile;
+            # Python only builds each frame's header and checksum trailer.
+            peer.send(sender.meta_frame())
+            with open(path, "rb") as f:
+                frames = iter_sendfile_frames(f, sender.file_id, sender.chunk_size, checksum_mode)
+                for header, offset, length, trailer in frames:
+                    peer.wait_for_capacity()
+                    peer.send((header, SendfileSegment(f, offset, length), trailer))
+                    report(len(header) + length + len(trailer))
+                # The writer still reads from f; keep it open until drained.
+                peer.flush()
+        else:
+            self._send_file_frames(peer, sender, report)
+            peer.flush()
         elapsed = time.time() - start_time
         size_mb = file_size / (1024 * 1024)
         speed_mbps = size_mb / elapsed if elapsed > 0 else 0
         print(f"\n[file sent] {path} ({size_mb:.2f} MB in {elapsed:.2f}s, {speed_mbps:.2f} MB/s)")
 
+    def _send_file_frames(self, peer: PeerConnection, sender: FileSender, report: Callable[[int], None]) -> None:
+        """Queue FileSender's frames on the peer's writer.
+        
+        Reason: Path for small files (one gathered write beats three syscalls
+        per frame) and platforms without os.preadv. The writer coalesces
+        queued frames into batched sendmsg calls.
+        """
+        for message in sender.messages():
+            # Binary frames already encoded; send as-is.
+            peer.wait_for_capacity()
+            peer.send(message)
+            report(_frame_size(message))
+
     def create_group(self, name: str) -> str:
         """Create a new group with this device as master.
         
         Reason: Creator is always master to simplify initial state.
         Broadcast ensures already-connected peers learn about the group.
         """
-        self_id = get_device_id()
+        self_id = self._device_id
         # Initialize group with only self; invites sent separately.
         group_id = self.store.create_group(name, [self_id], self_id)
         # Notify connected peers that we're the master (for future joins).
@@ -329,28 +972,29 @@ class ConnectionManager:
         if not group:
             self.on_group_notice("group not found")
             return
-        if group.get("master_id") != get_device_id():
+        if group.get("master_id") != self._device_id:
             self.on_group_notice("only the master can invite")
             return
+        # Every invitee gets the same invite: encode it once, on first use.
+        wire = None
         for peer_id in members:
             peer = self.peers.get(peer_id)
             if not peer:
                 self.on_group_notice(f"peer not connected: {peer_id}")
                 continue
-            message = {
-                "type": "group_invite",
-                "device_id": get_device_id(),
-                "device_name": get_device_name(),
-                "platform": get_platform(),
-                "timestamp": get_timestamp(),
-                "payload": {
-                    "group_id": group_id,
-                    "name": group.get("name"),
-                    "master_id": get_device_id(),
-                    "inviter_id": get_device_id(),
-                },
-            }
-            peer.send(message)
+            if wire is None:
+                wire = encode_message_parts(
+                    self._envelope(
+                        "group_invite",
+                        {
+                            "group_id": group_id,
+                            "name": group.get("name"),
+                            "master_id": self._device_id,
+                            "inviter_id": self._device_id,
+                        },
+                    )
+                )
+            peer.send(wire)
             self.on_group_notice(f"invite sent to {peer_id}")
 
     def accept_group_invite(self, group_id: str, master_id: str, name: str) -> None:
@@ -363,7 +1007,7 @@ class ConnectionManager:
         self.store.upsert_group(
             group_id,
             name,
-            [get_device_id(), master_id],
+            [self._device_id, master_id],
             master_id,
             get_timestamp(),
         )
@@ -373,18 +1017,14 @@ class ConnectionManager:
             self.on_group_notice("master not connected")
             return
         # Send join request to master.
-        message = {
-            "type": "group_join",
-            "device_id": get_device_id(),
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "timestamp": get_timestamp(),
-            "payload": {
+        message = self._envelope(
+            "group_join",
+            {
                 "group_id": group_id,
                 "name": name,
-                "from_id": get_device_id(),
+                "from_id": self._device_id,
             },
-        }
+        )
         peer.send(message)
         self.on_group_notice(f"join request sent to master {master_id}")
 
@@ -394,17 +1034,13 @@ class ConnectionManager:
         if not peer:
             self.on_group_notice("master not connected")
             return
-        message = {
-            "type": "group_join_reject",
-            "device_id": get_device_id(),
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "timestamp": get_timestamp(),
-            "payload": {
+        message = self._envelope(
+            "group_join_reject",
+            {
                 "group_id": group_id,
-                "from_id": get_device_id(),
+                "from_id": self._device_id,
             },
-        }
+        )
         peer.send(message)
         self.on_group_notice(f"reject sent to master {master_id}")
 
@@ -417,36 +1053,35 @@ class ConnectionManager:
         group = self.store.get_group(group_id)
         if not group:
             return
-        self_id = get_device_id()
-        members = set(group.get("members", []))
-        if self_id not in members:
-            members.add(self_id)
+        self_id = self._device_id
+        members = self.store.get_members(group_id) | {self_id}
         # Determine which members are currently connected.
         active_members = members.intersection(self.peers.keys()) | {self_id}
         master_id = group.get("master_id")
+        # One clock read serves the epoch, message id and envelope (seconds).
+        now = get_timestamp()
 
         # Elect new master if current one is offline.
         # Reason: Prevents message loss when master disconnects.
         if master_id not in active_members:
             master_id = self._elect_master(active_members)
-            self.store.update_group(group_id, {"master_id": master_id, "epoch": get_timestamp()})
+            election = {"master_id": master_id, "epoch": now}
+            self.store.update_group(group_id, election)
             if master_id == self_id:
                 # If we became master, broadcast our authority.
-                self._broadcast_group_master(group_id)
+                # Our view plus the same update equals the stored group.
+                self._broadcast_group_master(group_id, {**group, **election})
 
-        message = {
-            "type": "group_message",
-            "device_id": self_id,
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "timestamp": get_timestamp(),
-            "payload": {
+        message = self._envelope(
+            "group_message",
+            {
                 "group_id": group_id,
-                "message_id": self._new_message_id(),
+                "message_id": self._new_message_id(now),
                 "text": text,
                 "from_id": self_id,
             },
-        }
+            now,
+        )
 
         if master_id == self_id:
             # We are the master; store locally and relay to all members.
@@ -459,54 +1094,98 @@ class ConnectionManager:
             if peer:
                 peer.send(message)
 
-    def _accept_loop(self) -> None:
-        while self.running and self.server_sock:
-            try:
-                client_sock, _ = self.server_sock.accept()
-            except OSError:
-                break
-            peer = PeerConnection(client_sock, self._handle_message, self._handle_binary_frame, self._handle_disconnect, False)
-            peer.start()
+    def _on_accept(self, client_sock: socket.socket) -> None:
+        """Wrap an inbound connection; runs on the reactor thread."""
+        if not self.running:
+            client_sock.close()
+            return
+        _tune_socket(client_sock)
+        peer = PeerConnection(
+            client_sock, self._handle_message, self._handle_binary_frame, self._handle_disconnect, False, self.reactor
+        )
+        peer.start()
 
     def _send_handshake(self, peer: PeerConnection) -> None:
-        message = {
-            "type": "handshake",
-            "device_id": get_device_id(),
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "timestamp": get_timestamp(),
-        }
-        peer.send(message)
+        """Send our identity as a pre-encoded frame.
+        
+        Reason: Every field but the timestamp is fixed for the process, so
+        the JSON is encoded once and each handshake appends the timestamp.
+        """
+        data = self._handshake_prefix + str(get_timestamp()).encode("ascii") + b"}"
+        peer.send((len(data).to_bytes(4, "big"), data))
 
-    def _broadcast_group_master(self, group_id: str) -> None:
+    def _broadcast_group_master(self, group_id: str, group: Optional[Mapping] = None) -> None:
         """Broadcast master announcement to group members.
         
         Reason: Ensures peers have consistent view of group state after
         master election or new joins.
+        
+        Args:
+            group: Current group state if the caller already holds it;
+                fetched from the store otherwise
         """
-        group = self.store.get_group(group_id)
+        if group is None:
+            group = self.store.get_group(group_id)
         if not group:
             return
-        master_id = group.get("master_id")
-        if master_id != get_device_id():
+        if group.get("master_id") != self._device_id:
             return
-        message = {
-            "type": "group_master",
-            "device_id": get_device_id(),
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "timestamp": get_timestamp(),
-            "payload": {
-                "group_id": group_id,
-                "name": group.get("name"),
-                "members": group.get("members", []),
-                "master_id": master_id,
-                "epoch": group.get("epoch"),
-            },
-        }
-        for peer_id, peer in self.peers.items():
-            if peer_id in set(group.get("members", [])):
-                peer.send(message)
+        recipients = self._group_recipients(group_id, exclude_id=None)
+        if recipients:
+            # Encoded once (and reused until the group changes).
+            wire = self._group_master_frame(group_id, group)
+            for peer in recipients:
+                peer.send(wire)
+
+    def _group_master_frame(self, group_id: str, group: Mapping) -> Tuple[bytes, bytes]:
+        """Return the encoded group_master announcement for group's state.
+        
+        Reason: The same announcement goes to every member on each election,
+        join and peer handshake, while the group itself rarely changes, so
+        the frame is cached per group and rebuilt only when name, members,
+        master or epoch differ. Its timestamp is when that state was first
+        announced.
+        """
+        state = (group.get("name"), tuple(group.get("members", [])), group.get("master_id"), group.get("epoch"))
+        cached = self._master_frames.get(group_id)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        frame = encode_message_parts(
+            self._envelope(
+                "group_master",
+                {
+                    "group_id": group_id,
+                    "name": state[0],
+                    "members": list(state[1]),
+                    "master_id": state[2],
+                    "epoch": state[3],
+                },
+            )
+        )
+        # One tuple store; a racing handler at worst encodes it twice.
+        self._master_frames[group_id] = (state, frame)
+        return frame
+
+    def _group_recipients(self, group_id: str, exclude_id: Optional[str]) -> Tuple[PeerConnection, ...]:
+        """Return connected peers that belong to the group, minus exclude_id.
+        
+        Reason: Relays repeat for every group message while membership and
+        connections rarely change, so the connected-member tuple is cached
+        until the peer snapshot or the group's member set is replaced.
+        """
+        peers = self._peers_snapshot
+        members = self.store.get_members(group_id)
+        cached = self._recipients_cache.get(group_id)
+        if cached is not None and cached[0] is peers and cached[1] is members:
+            recipients = cached[2]
+        else:
+            # Walk the member set (usually small), not every connected peer.
+            recipients = tuple(peers[member_id] for member_id in members if member_id in peers)
+            self._recipients_cache[group_id] = (peers, members, recipients)
+        if exclude_id is None or exclude_id not in members:
+            # Nothing to drop: share the cached tuple.
+            return recipients
+        return tuple(peer for peer in recipients if peer.device_id != exclude_id)
 
     def _store_group_message(self, group_id: str, message: Dict) -> None:
         """Persist group message and notify UI.
@@ -516,22 +1195,30 @@ class ConnectionManager:
         self.store.append_group(group_id, message)
         self.on_group(message.get("device_id", "unknown"), group_id, message.get("payload", {}).get("text", ""))
 
-    def _relay_group_message(self, group_id: str, message: Dict, exclude_id: Optional[str]) -> None:
+    def _relay_group_message(
+        self, group_id: str, message: Dict, exclude_id: Optional[str], raw: Optional[bytearray] = None
+    ) -> None:
         """Forward group message to all active members except sender.
         
         Reason: Master is single source of truth; prevents duplicate delivery.
-        exclude_id avoids echoing message back to sender.
+        exclude_id avoids echoing message back to sender. The frame is built
+        once for all recipients: from the received payload bytes when relaying
+        (no re-encode), otherwise by encoding message a single time.
+        
+        Args:
+            raw: Exact JSON payload as received, if this is a relay
         """
-        group = self.store.get_group(group_id)
-        if not group:
+        recipients = self._group_recipients(group_id, exclude_id)
+        if not recipients:
             return
-        members = set(group.get("members", []))
-        for peer_id, peer in self.peers.items():
-            if peer_id not in members:
-                continue
-            if exclude_id and peer_id == exclude_id:
-                continue
-            peer.send(message)
+        frame: Union[bytes, Tuple[bytes, ...]]
+        if raw is not None:
+            # Length prefix + untouched payload, gathered by sendmsg.
+            frame = (len(raw).to_bytes(4, "big"), raw)
+        else:
+            frame = encode_message_parts(message)
+        for peer in recipients:
+            peer.send(frame)
 
     def _elect_master(self, active_members: Set[str]) -> str:
         """Elect new master using deterministic rule.
@@ -541,206 +1228,222 @@ class ConnectionManager:
         """
         return sorted(active_members)[0]
 
-    def _new_message_id(self) -> str:
+    def _envelope(self, msg_type: str, payload: Dict, timestamp: Optional[int] = None) -> Dict:
+        """Build a protocol message with this device's identity fields.
+        
+        Reason: Copies a prebuilt identity template instead of looking up
+        device id, name and platform for every message sent.
+        
+        Args:
+            timestamp: Time captured once by a caller emitting several
+                messages for one operation; read fresh when omitted
+        """
+        if timestamp is None:
+            timestamp = get_timestamp()
+        return {"type": msg_type, **self._envelope_template, "timestamp": timestamp, "payload": payload}
+
+    def _new_message_id(self, timestamp: Optional[int] = None) -> str:
         """Generate unique message ID for idempotency.
         
         Format: <device_id>-<timestamp> ensures uniqueness across peers.
         Reason: Enables future de-duplication if messages are relayed multiple times.
         """
-        return f"{get_device_id()}-{get_timestamp()}"
+        if timestamp is None:
+            timestamp = get_timestamp()
+        return f"{self._device_id}-{timestamp}"
 
-    def _handle_message(self, peer: PeerConnection, message: Dict) -> None:
+    def _handle_message(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray] = None) -> None:
         """Route inbound messages by type to appropriate handlers.
         
-        Reason: Centralized dispatch simplifies adding new message types.
-        Called from peer's read thread; must be thread-safe.
-        """
-        msg_type = message.get("type")
-        if msg_type == "handshake":
-            # Extract peer identity from handshake.
-            peer.device_id = message.get("device_id")
-            peer.device_name = message.get("device_name")
-            peer.platform = message.get("platform")
-            if peer.device_id:
-                # Register peer in active connections map.
-                self.peers[peer.device_id] = peer
-                self.on_peer_connected(peer.device_id, peer.device_name or "unknown")
-                # Send our current group master state to new peer.
-                self._send_group_state(peer.device_id)
-            if not peer.is_outbound:
-                # Inbound connection: send our handshake in response.
-                self._send_handshake(peer)
-            return
+        Reason: One dict lookup (self._msg_dispatch, built in __init__)
+        replaces a chain of string comparisons; unknown types are ignored.
+        Called from the dispatch pool; must be thread-safe.
+        
+        Args:
+            raw: The frame's JSON payload bytes, used to relay group
+                messages without re-encoding
+        """
+        handler = self._msg_dispatch.get(message.get("type"))
+        if handler is not None:
+            handler(peer, message, raw)
 
-        if msg_type == "message":
-            # Direct message from peer.
-            peer_id = message.get("device_id", "unknown")
-            text = message.get("payload", {}).get("text", "")
-            self.on_text(peer_id, text)  # Notify UI.
-            # Store for history; both sides store for consistency.
-            self.store.append_direct(peer_id, message)
-            return
+    def _on_handshake(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Record the peer's identity and checksum modes; register it and reply if inbound."""
+        # Extract peer identity from handshake.
+        peer.device_id = message.get("device_id")
+        peer.device_name = message.get("device_name")
+        peer.platform = message.get("platform")
+        advertised = message.get("checksums")
+        if isinstance(advertised, list):
+            peer.checksum_modes = tuple(m for m in advertised if m in SUPPORTED_CHECKSUMS)
+        if peer.device_id:
+            # Register peer in active connections map.
+            self._add_peer(peer.device_id, peer)
+            self.on_peer_connected(peer.device_id, peer.device_name or "unknown")
+            # Send our current group master state to new peer.
+            self._send_group_state(peer.device_id)
+        if not peer.is_outbound:
+            # Inbound connection: send our handshake in response.
+            self._send_handshake(peer)
 
-        if msg_type == "group_master":
-            payload = message.get("payload", {})
-            group_id = payload.get("group_id")
-            if not group_id:
-                return
-            update = {
-                "name": payload.get("name", "group"),
-                "members": payload.get("members", []),
-                "master_id": payload.get("master_id"),
-                "epoch": payload.get("epoch", get_timestamp()),
-            }
-            if self.store.get_group(group_id) is None:
-                self.store.upsert_group(
-                    group_id,
-                    update.get("name", "group"),
-                    update.get("members", []),
-                    update.get("master_id", ""),
-                    update.get("epoch", get_timestamp()),
-                )
-            else:
-                self.store.update_group(group_id, update)
-            return
+    def _on_direct_message(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Direct message from peer."""
+        peer_id = message.get("device_id", "unknown")
+        text = message.get("payload", {}).get("text", "")
+        self.on_text(peer_id, text)  # Notify UI.
+        # Store for history; both sides store for consistency.
+        self.store.append_direct(peer_id, message)
 
-        if msg_type == "group_invite":
-            payload = message.get("payload", {})
-            group_id = payload.get("group_id")
-            name = payload.get("name", "group")
-            master_id = payload.get("master_id")
-            inviter_id = payload.get("inviter_id", message.get("device_id", "unknown"))
-            if not group_id or not master_id:
-                return
-            self.on_group_invite(group_id, name, master_id, inviter_id)
+    def _on_group_master(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Adopt the master's view of a group (name, members, master, epoch)."""
+        payload = message.get("payload", {})
+        group_id = payload.get("group_id")
+        if not group_id:
             return
-
-        if msg_type == "group_join":
-            payload = message.get("payload", {})
-            group_id = payload.get("group_id")
-            from_id = payload.get("from_id")
-            if not group_id or not from_id:
-                return
-            group = self.store.get_group(group_id)
-            if not group or group.get("master_id") != get_device_id():
-                return
-            members = set(group.get("members", []))
-            members.add(from_id)
-            self.store.update_group(group_id, {"members": list(members)})
-            ack = {
-                "type": "group_join_ack",
-                "device_id": get_device_id(),
-                "device_name": get_device_name(),
-                "platform": get_platform(),
-                "timestamp": get_timestamp(),
-                "payload": {
-                    "group_id": group_id,
-                    "name": group.get("name"),
-                    "members": sorted(members),
-                    "master_id": get_device_id(),
-                    "epoch": group.get("epoch"),
-                },
-            }
-            peer = self.peers.get(from_id)
-            if peer:
-                peer.send(ack)
-            self._broadcast_group_master(group_id)
-            self.on_group_notice(f"member joined {group_id}: {from_id}")
-            return
-
-        if msg_type == "group_join_ack":
-            payload = message.get("payload", {})
-            group_id = payload.get("group_id")
-            if not group_id:
-                return
+        update = {
+            "name": payload.get("name", "group"),
+            "members": payload.get("members", []),
+            "master_id": payload.get("master_id"),
+            "epoch": payload.get("epoch", get_timestamp()),
+        }
+        group = self.store.get_group(group_id)
+        if group is None:
             self.store.upsert_group(
                 group_id,
-                payload.get("name", "group"),
-                payload.get("members", []),
-                payload.get("master_id", ""),
-                payload.get("epoch", get_timestamp()),
+                update.get("name", "group"),
+                update.get("members", []),
+                update.get("master_id", ""),
+                update.get("epoch", get_timestamp()),
             )
-            self.on_group_notice(f"joined group {group_id}")
             return
+        # Masters re-announce on every connect; skip the state rewrite when
+        # nothing changed (members compared as the store's cached set).
+        if (
+            group.get("name") == update["name"]
+            and group.get("master_id") == update["master_id"]
+            and group.get("epoch") == update["epoch"]
+            and self.store.get_members(group_id) == frozenset(update["members"])
+        ):
+            return
+        self.store.update_group(group_id, update)
 
-        if msg_type == "group_join_reject":
-            payload = message.get("payload", {})
-            group_id = payload.get("group_id")
-            from_id = payload.get("from_id")
-            if not group_id or not from_id:
-                return
-            self.on_group_notice(f"invite rejected {group_id} by {from_id}")
+    def _on_group_invite(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Surface a group invite to the UI."""
+        payload = message.get("payload", {})
+        group_id = payload.get("group_id")
+        name = payload.get("name", "group")
+        master_id = payload.get("master_id")
+        inviter_id = payload.get("inviter_id", message.get("device_id", "unknown"))
+        if not group_id or not master_id:
             return
+        self.on_group_invite(group_id, name, master_id, inviter_id)
 
-        if msg_type == "group_message":
-            # Group message: store locally, relay if we're master.
-            payload = message.get("payload", {})
-            group_id = payload.get("group_id")
-            if not group_id:
-                return
-            # Always store locally for history.
-            self._store_group_message(group_id, message)
-            group = self.store.get_group(group_id)
-            if group and group.get("master_id") == get_device_id():
-                # We're the master; relay to other members.
-                # Reason: Only master relays to prevent message loops.
-                self._relay_group_message(group_id, message, exclude_id=message.get("device_id"))
+    def _on_group_join(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Master side of a join: add the member, ACK it, announce the new roster."""
+        payload = message.get("payload", {})
+        group_id = payload.get("group_id")
+        from_id = payload.get("from_id")
+        if not group_id or not from_id:
+            return
+        group = self.store.get_group(group_id)
+        if not group or group.get("master_id") != self._device_id:
             return
+        if from_id not in self.store.get_members(group_id):
+            # Same normalization as the store, so our record stays current.
+            members = tuple(sorted(self.store.get_members(group_id) | {from_id}))
+            self.store.update_group(group_id, {"members": members})
+            group = {**group, "members": members}
+        ack = self._envelope(
+            "group_join_ack",
+            {
+                "group_id": group_id,
+                "name": group.get("name"),
+                "members": group["members"],
+                "master_id": self._device_id,
+                "epoch": group.get("epoch"),
+            },
+        )
+        # Reply to the joining member, not necessarily the sending peer.
+        member = self.peers.get(from_id)
+        if member:
+            member.send(ack)
+        self._broadcast_group_master(group_id, group)
+        self.on_group_notice(f"member joined {group_id}: {from_id}")
 
-        if msg_type == "file_meta":
-            file_id = message.get("payload", {}).get("file_id")
-            filename = message.get("payload", {}).get("filename")
-            size = message.get("payload", {}).get("size")
-            if file_id and filename and size is not None:
-                receiver = FileReceiver(file_id, filename, int(size))
-                self.file_receivers[file_id] = receiver
+    def _on_group_join_ack(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Store the roster the master confirmed after our join request."""
+        payload = message.get("payload", {})
+        group_id = payload.get("group_id")
+        if not group_id:
             return
+        self.store.upsert_group(
+            group_id,
+            payload.get("name", "group"),
+            payload.get("members", []),
+            payload.get("master_id", ""),
+            payload.get("epoch", get_timestamp()),
+        )
+        self.on_group_notice(f"joined group {group_id}")
 
-        if msg_type == "file_chunk":
-            file_id = message.get("payload", {}).get("file_id")
-            chunk = message.get("payload", {}).get("data")
-            if not file_id or not chunk:
-                return
-            receiver = self.file_receivers.get(file_id)
-            if not receiver:
-                return
-            done = receiver.write_chunk_json(chunk)
-            if done:
-                path = receiver.close()
-                elapsed = getattr(receiver, 'elapsed_time', 0.0)
-                size_mb = receiver.size / (1024 * 1024)
-                speed_mbps = size_mb / elapsed if elapsed > 0 else 0
-                print(f"\n[file received] {path} ({size_mb:.2f} MB in {elapsed:.2f}s, {speed_mbps:.2f} MB/s)")
-                self.on_file(peer.device_id or "unknown", path)
-                self.file_receivers.pop(file_id, None)
+    def _on_group_join_reject(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Tell the UI an invitee rejected our invite."""
+        payload = message.get("payload", {})
+        group_id = payload.get("group_id")
+        from_id = payload.get("from_id")
+        if not group_id or not from_id:
             return
+        self.on_group_notice(f"invite rejected {group_id} by {from_id}")
 
-    def _handle_binary_frame(self, peer: PeerConnection, frame_type: int, frame_data: bytes) -> None:
-        """Handle binary file transfer frames."""
-        try:
-            from binary_protocol import (
-                BinaryProtocolError,
-                FRAME_TYPE_FILE_META,
-                FRAME_TYPE_FILE_CHUNK,
-                decode_binary_file_meta,
-                decode_binary_file_chunk,
-            )
-        except Exception:
+    def _on_group_message(self, peer: PeerConnection, message: Dict, raw: Optional[bytearray]) -> None:
+        """Group message: store locally, relay if we're master."""
+        payload = message.get("payload", {})
+        group_id = payload.get("group_id")
+        if not group_id:
             return
+        # One store lookup serves the master check below.
+        group = self.store.get_group(group_id)
+        # Always store locally for history.
+        self._store_group_message(group_id, message)
+        if group and group.get("master_id") == self._device_id:
+            # We're the master; relay to other members.
+            # Reason: Only master relays to prevent message loops.
+            self._relay_group_message(group_id, message, exclude_id=message.get("device_id"), raw=raw)
 
+    def _handle_binary_frame(self, peer: PeerConnection, frame_type: int, frame_data: bytes) -> None:
+        """Handle binary file transfer frames."""
         try:
             if frame_type == FRAME_TYPE_FILE_META:
-                file_id, filename, size, _compression = decode_binary_file_meta(frame_data)
+                file_id, filename, size, _compression, checksum_mode = decode_binary_file_meta(frame_data)
+                if file_id in self.file_receivers:
+                    if file_id not in peer.file_ids:
+                        # Another peer's transfer; it is not ours to replace.
+                        return
+                    # Announced twice; never leave the first file orphaned.
+                    self._abort_receive(peer, file_id)
                 receiver = FileReceiver(file_id, filename, int(size))
+                receiver.checksum_mode = checksum_mode
                 self.file_receivers[file_id] = receiver
+                peer.file_ids.add(file_id)
                 return
 
             if frame_type == FRAME_TYPE_FILE_CHUNK:
-                file_id, chunk_index, _chunk_size, chunk_data = decode_binary_file_chunk(frame_data)
-                receiver = self.file_receivers.get(file_id)
+                # Look up the transfer first (file_id sits at bytes 4-20) so the
+                # chunk is held to the checksum mode its meta frame announced.
+                # Only the peer that announced a transfer may feed it.
+                file_id = bytes(frame_data[4:20])
+                receiver = self.file_receivers.get(file_id) if file_id in peer.file_ids else None
                 if not receiver:
                     return
-                done = receiver.write_chunk_binary(chunk_index, chunk_data)
+                try:
+                    _file_id, chunk_index, _chunk_size, chunk_data = decode_binary_file_chunk(
+                        frame_data, checksum_mode=receiver.checksum_mode
+                    )
+                    done = receiver.write_chunk_binary(chunk_index, chunk_data)
+                except (BinaryProtocolError, OSError) as e:
+                    # Corrupt chunk or disk error: the file cannot complete.
+                    print(f"[file receive aborted] {receiver.filename}: {e}")
+                    self._abort_receive(peer, file_id)
+                    return
                 if done:
                     path = receiver.close()
                     elapsed = getattr(receiver, 'elapsed_time', 0.0)
@@ -749,6 +1452,7 @@ class ConnectionManager:
                     print(f"\n[file received] {path} ({size_mb:.2f} MB in {elapsed:.2f}s, {speed_mbps:.2f} MB/s)")
                     self.on_file(peer.device_id or "unknown", path)
                     self.file_receivers.pop(file_id, None)
+                    peer.file_ids.discard(file_id)
                 return
         except BinaryProtocolError as e:
             print(f"[binary protocol error] {e}")
@@ -759,29 +1463,27 @@ class ConnectionManager:
             return
         groups = self.store.get_groups()
         for group_id, group in groups.items():
-            members = set(group.get("members", []))
-            if peer_id not in members:
+            if peer_id not in self.store.get_members(group_id):
                 continue
-            if group.get("master_id") != get_device_id():
+            if group.get("master_id") != self._device_id:
                 continue
-            message = {
-                "type": "group_master",
-                "device_id": get_device_id(),
-                "device_name": get_device_name(),
-                "platform": get_platform(),
-                "timestamp": get_timestamp(),
-                "payload": {
-                    "group_id": group_id,
-                    "name": group.get("name"),
-                    "members": group.get("members", []),
-                    "master_id": group.get("master_id"),
-                    "epoch": group.get("epoch"),
-                },
-            }
-            peer.send(message)
+            peer.send(self._group_master_frame(group_id, group))
+
+    def _abort_receive(self, peer: PeerConnection, file_id: bytes) -> None:
+        """Drop an incomplete inbound transfer and remove its partial file."""
+        peer.file_ids.discard(file_id)
+        receiver = self.file_receivers.pop(file_id, None)
+        if receiver is None:
+            return
+        try:
+            receiver.abort()
+        except OSError as e:
+            print(f"[file cleanup error] {receiver.path}: {e}")
 
     def _handle_disconnect(self, peer: PeerConnection) -> None:
-        if peer.device_id and peer.device_id in self.peers:
-            self.peers.pop(peer.device_id, None)
+        # Transfers from this peer can never finish now.
+        for file_id in list(peer.file_ids):
+            self._abort_receive(peer, file_id)
+        if peer.device_id and self._remove_peer(peer):
             self.on_peer_disconnected(peer.device_id)
         peer.close()
@@ -8,38 +8,115 @@ Rationale:
 - UDP chosen for its broadcast capability and low overhead.
 - Broadcast avoids need for multicast (often blocked/requires IGMP).
 - Continuous announcements handle dynamic joins/leaves gracefully.
+- One thread waits in select() with the next broadcast as its deadline, so
+  listening and announcing share a thread and the socket has one user.
+  Given the connection manager's reactor, discovery runs on that thread
+  instead and adds none of its own.
+- JSON goes through protocol.json_dumps/json_loads (orjson when installed),
+  parsed straight from a reused receive buffer.
+- Identity fields are fixed for the process and the local IP is refreshed
+  once per broadcast cycle. Each packet type is JSON-encoded once per IP
+  as a prefix; sending only appends the timestamp.
+- On Linux, queued packets are read RECV_BATCH at a time with recvmmsg()
+  (see _recvmmsg); elsewhere one recvfrom_into() per packet.
 """
 
 import json
+import selectors
 import socket
 import threading
 import time
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, Optional, Tuple
 
+from _recvmmsg import RECV_BATCH, make_batch_receiver
+from connection_manager import PeerReactor
+from protocol import json_dumps, json_loads
 from utils import get_device_id, get_device_name, get_platform, get_timestamp, get_local_ip
 
 # Port 50000 chosen to avoid conflicts with well-known services.
 DISCOVERY_PORT = 50000
 # Broadcast to all devices on LAN; routers typically block this from leaving subnet.
 BROADCAST_ADDR = "255.255.255.255"
+# Seconds between announcements; balances discovery speed vs network overhead.
+BROADCAST_INTERVAL = 3.0
+# A known device with unchanged details is reported again after this long.
+DEVICE_REFRESH_INTERVAL = 5.0
+# Minimum seconds between unicast responses to the same requester IP.
+RESPONSE_INTERVAL = 2.0
+# Largest UDP payload over IPv4, so no datagram is ever truncated; the
+# packets we send are a few hundred bytes.
+MAX_PACKET_SIZE = 65507
+# Receive buffer requested for the discovery socket. Each queued datagram
+# costs ~1-2 KB of kernel memory, so the default (~200 KB) holds ~100-200.
+DISCOVERY_RCVBUF = 1024 * 1024
+# Fields whose change is reported immediately, whatever the interval.
+DEVICE_FIELDS = ("device_name", "platform", "ip", "tcp_port")
+
+
+def _valid_response(message: Dict) -> bool:
+    """Return True if a response's reported fields have the expected types.
+    
+    Reason: Responses reach the UI, which keys on device_id and connects
+    to ip:tcp_port; a packet from anyone on the LAN must not smuggle in
+    values that break it.
+    """
+    for field in ("device_name", "platform", "ip"):
+        if not isinstance(message.get(field), str):
+            return False
+    port = message.get("tcp_port")
+    # bool is an int subclass; exclude it explicitly.
+    return isinstance(port, int) and not isinstance(port, bool) and 0 < port < 65536
 
 
 class DiscoveryService:
     """Broadcasts discovery requests and listens for responses.
     
     Reason: Separate class isolates discovery from connection logic.
-    Two threads (broadcast + listen) avoid blocking each other.
+    A single selector thread (its own, or a shared reactor's) both listens
+    and broadcasts on schedule.
     """
-    def __init__(self, tcp_port: int, on_device: Callable[[Dict[str, str]], None]) -> None:
+    def __init__(
+        self,
+        tcp_port: int,
+        on_device: Callable[[Dict[str, str]], None],
+        reactor: Optional[PeerReactor] = None,
+    ) -> None:
+        """Initialize discovery.
+        
+        Args:
+            tcp_port: TCP port announced to peers
+            on_device: Called with each new, changed or stale peer entry
+            reactor: Shared reactor to run on; a private thread otherwise
+        """
         self.tcp_port = tcp_port
         self.on_device = on_device
+        self.reactor = reactor
         self.running = False
-        self.listener_thread: Optional[threading.Thread] = None
-        self.broadcast_thread: Optional[threading.Thread] = None
+        self.thread: Optional[threading.Thread] = None
         self.sock: Optional[socket.socket] = None
+        # Static identity fields; resolved once (get_device_id reads a file).
+        self._identity = {
+            "device_id": get_device_id(),
+            "device_name": get_device_name(),
+            "platform": get_platform(),
+        }
+        # Refreshed each broadcast cycle so responses never look it up.
+        self._local_ip = ""
+        # msg_type -> (ip, encoded packet up to the timestamp value).
+        self._prefixes: Dict[str, Tuple[str, bytes]] = {}
+        # device_id -> (last reported monotonic time, reported DEVICE_FIELDS).
+        # Reason: Peers answer every broadcast; the UI only needs news.
+        # Touched by the discovery (or reactor) thread alone, so no lock.
+        self._reported: Dict[str, Tuple[float, Tuple]] = {}
+        # requester IP -> monotonic time of our last response to it.
+        self._responded: Dict[str, float] = {}
+        # recvmmsg() receiver (Linux); None keeps the recvfrom_into loop.
+        self._batch = make_batch_receiver(MAX_PACKET_SIZE)
+        # Receive buffer for the recvfrom_into loop, reused for every packet.
+        self._recv_buf = bytearray(MAX_PACKET_SIZE) if self._batch is None else None
 
     def start(self) -> None:
-        """Initialize UDP socket and start broadcast/listen threads.
+        """Initialize UDP socket and start the discovery thread.
         
         Reason: SO_BROADCAST required to send to 255.255.255.255.
         SO_REUSEADDR allows multiple instances on same machine (testing).
@@ -47,82 +124,205 @@ class DiscoveryService:
         if self.running:
             return
         self.running = True
+        # Resolved before the listener starts answering requests.
+        self._local_ip = get_local_ip()
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         # Allow address reuse for testing multiple clients on one machine.
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         # Enable broadcast mode for LAN-wide announcements.
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            # Room for a burst of announcements from a busy LAN.
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, DISCOVERY_RCVBUF)
+        except OSError:
+            # Kernel default is still enough for a handful of peers.
+            pass
         # Bind to discovery port to receive announcements from others.
         self.sock.bind(("", DISCOVERY_PORT))
-        # Spawn listener thread to process incoming announcements.
-        self.listener_thread = threading.Thread(target=self._listen, daemon=True)
-        self.listener_thread.start()
-        # Spawn broadcaster to periodically announce our presence.
-        self.broadcast_thread = threading.Thread(target=self._broadcast_loop, daemon=True)
-        self.broadcast_thread.start()
+        # Non-blocking: the loop drains every queued packet per wakeup.
+        self.sock.setblocking(False)
+        if self.reactor is not None:
+            # Shared select(): read on readiness, announce from a timer.
+            sock = self.sock
+            self.reactor.add_reader(sock, lambda: self._drain(sock))
+            self.reactor.call_soon(self._beacon, sock)
+            return
+        # One thread listens for packets and announces our presence.
+        self.thread = threading.Thread(target=self._run, args=(self.sock,), daemon=True)
+        self.thread.start()
 
     def stop(self) -> None:
         self.running = False
-        if self.sock:
+        if self.sock and self.reactor is not None:
+            # The reactor unregisters then closes it.
+            self.reactor.remove_reader(self.sock)
+        elif self.sock:
+            try:
+                # Wakes the select() in _run (Linux); it reports ENOTCONN
+                # for an unconnected UDP socket, which is harmless.
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            if self.thread and self.thread is not threading.current_thread():
+                # Closing first would drop the wakeup; let the loop see it.
+                self.thread.join(timeout=1.0)
             self.sock.close()
 
-    def _broadcast_loop(self) -> None:
-        """Periodically broadcast discovery request to LAN.
+    def _run(self, sock: socket.socket) -> None:
+        """Listen for packets and broadcast every BROADCAST_INTERVAL seconds.
+        
+        Reason: select() sleeps until a packet arrives or the next
+        announcement is due, so no thread sits in recvfrom() or sleep().
+        The loop exits once stop() closes sock (or a restart replaces it).
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        next_broadcast = time.monotonic()
+        try:
+            while self.running and self.sock is sock:
+                now = time.monotonic()
+                if now >= next_broadcast:
+                    self._broadcast(sock)
+                    next_broadcast = now + BROADCAST_INTERVAL
+                    now = time.monotonic()
+                if selector.select(timeout=max(0.0, next_broadcast - now)):
+                    if not self._drain(sock):
+                        break
+        finally:
+            selector.close()
+
+    def _beacon(self, sock: socket.socket) -> None:
+        """Broadcast now and reschedule on the reactor (shared-reactor mode)."""
+        if not self.running or self.sock is not sock:
+            # Stopped or restarted; this socket's schedule ends.
+            return
+        self._broadcast(sock)
+        self.reactor.call_later(BROADCAST_INTERVAL, self._beacon, sock)
+
+    def _broadcast(self, sock: socket.socket) -> None:
+        """Broadcast a discovery request to the LAN.
         
         Reason: Continuous announcements handle peers joining at any time.
-        3 second interval balances discovery speed vs network overhead.
         """
-        while self.running and self.sock:
-            # Build discovery announcement with our identity and TCP endpoint.
-            message = {
-                "type": "discovery_request",
-                "device_id": get_device_id(),
-                "device_name": get_device_name(),
-                "platform": get_platform(),
-                "ip": get_local_ip(),
-                "tcp_port": self.tcp_port,
-                "timestamp": get_timestamp(),
-            }
-            # Compact JSON to minimize packet size.
-            data = json.dumps(message, separators=(",", ":"), ensure_ascii=True).encode("utf-8")
-            try:
-                # Broadcast to all devices on LAN.
-                self.sock.sendto(data, (BROADCAST_ADDR, DISCOVERY_PORT))
-            except OSError:
-                # Network error; continue silently to retry next cycle.
-                pass
-            # Wait before next announcement to avoid flooding the network.
-            time.sleep(3)
+        # Discovery announcement with our identity and TCP endpoint.
+        data = self._packet("discovery_request")
+        try:
+            # Broadcast to all devices on LAN.
+            sock.sendto(data, (BROADCAST_ADDR, DISCOVERY_PORT))
+        except OSError:
+            # Network error; continue silently to retry next cycle.
+            pass
+        # Pick up interface changes (DHCP renew, network switch) for the
+        # next cycle's packets.
+        try:
+            self._local_ip = get_local_ip()
+        except OSError:
+            # No address right now (the hostname fallback raised gaierror);
+            # keep the last one and retry next cycle. Letting this escape
+            # would end the loop thread or drop the reactor beacon timer.
+            pass
+        self._prune(time.monotonic())
 
-    def _listen(self) -> None:
-        """Listen for discovery packets and respond or notify UI.
+    def _prune(self, now: float) -> None:
+        """Forget throttle entries whose window has passed.
         
-        Reason: Blocking recvfrom is fine; dedicated thread prevents blocking other logic.
+        Reason: Keyed by sender, so a busy or spoofed LAN would grow both
+        dicts without bound. An expired entry throttles nothing, so
+        dropping it never changes what is answered or reported.
         """
-        while self.running and self.sock:
+        self._responded = {
+            ip: sent for ip, sent in self._responded.items() if now - sent < RESPONSE_INTERVAL
+        }
+        self._reported = {
+            device_id: entry
+            for device_id, entry in self._reported.items()
+            if now - entry[0] < DEVICE_REFRESH_INTERVAL
+        }
+
+    def _drain(self, sock: socket.socket) -> bool:
+        """Handle every queued discovery packet; return False once sock closed."""
+        if self._batch is not None:
+            return self._drain_batched(sock)
+        # Packets are parsed before the next read overwrites the buffer.
+        buffer = self._recv_buf
+        view = memoryview(buffer)
+        while True:
             try:
-                # Wait for incoming UDP packet.
-                data, addr = self.sock.recvfrom(4096)
+                # Take the next queued UDP packet.
+                nbytes, addr = sock.recvfrom_into(buffer)
+            except BlockingIOError:
+                # Queue empty; back to select().
+                return True
             except OSError:
                 # Socket closed; exit loop.
-                break
+                return False
+            self._handle_packet(view[:nbytes], addr[0])
+
+    def _drain_batched(self, sock: socket.socket) -> bool:
+        """Drain the queue RECV_BATCH packets per recvmmsg() call.
+        
+        Reason: A burst of announcements costs one syscall per batch
+        instead of one per packet.
+        """
+        while True:
             try:
-                message = json.loads(data.decode("utf-8"))
-            except json.JSONDecodeError:
-                # Malformed packet; ignore and continue.
-                continue
-
-            msg_type = message.get("type")
-            if msg_type == "discovery_request":
-                # Another peer is announcing; send unicast response.
-                self._send_response(addr[0])
-            elif msg_type == "discovery_response":
-                # Got a response; ignore if it's from ourselves.
-                if message.get("device_id") == get_device_id():
-                    continue
-                # Notify UI layer of discovered peer.
+                packets = self._batch.receive(sock.fileno())
+            except OSError:
+                # Socket closed (fileno() is -1 or EBADF); exit loop.
+                return False
+            for data, ip in packets:
+                self._handle_packet(data, ip)
+            if len(packets) < RECV_BATCH:
+                # Short batch: the queue was emptied; back to select().
+                return True
+
+    def _handle_packet(self, data: memoryview, ip: str) -> None:
+        """Act on one discovery packet received from ip."""
+        try:
+            message = json_loads(data)
+        except json.JSONDecodeError:
+            # Malformed packet; ignore.
+            return
+        if not isinstance(message, dict):
+            # Valid JSON but not a discovery message.
+            return
+
+        msg_type = message.get("type")
+        device_id = message.get("device_id")
+        if not isinstance(device_id, str) or not device_id:
+            # Every discovery packet names its sender; drop anything else
+            # (a list or dict here would not even be a valid dict key).
+            return
+        if device_id == self._identity["device_id"]:
+            # Our own broadcast (or an answer to it) looped back.
+            return
+        if msg_type == "discovery_request":
+            # Another peer is announcing; send unicast response unless
+            # this requester was answered moments ago.
+            now = time.monotonic()
+            if now - self._responded.get(ip, -RESPONSE_INTERVAL) >= RESPONSE_INTERVAL:
+                self._responded[ip] = now
+                self._send_response(ip)
+        elif msg_type == "discovery_response":
+            if _valid_response(message) and self._is_news(message):
+                # Notify UI layer of a new, changed or stale peer entry.
                 self.on_device(message)
 
+    def _is_news(self, message: Dict) -> bool:
+        """Return True if a response should reach on_device.
+        
+        Reason: A device is reported when first seen, when its details
+        change, and otherwise at most every DEVICE_REFRESH_INTERVAL seconds.
+        """
+        device_id = message.get("device_id")
+        details = tuple(message.get(field) for field in DEVICE_FIELDS)
+        now = time.monotonic()
+        last = self._reported.get(device_id)
+        if last is not None and last[1] == details and now - last[0] < DEVICE_REFRESH_INTERVAL:
+            return False
+        self._reported[device_id] = (now, details)
+        return True
+
     def _send_response(self, ip: str) -> None:
         """Send unicast discovery response to a specific peer.
         
@@ -131,20 +331,35 @@ class DiscoveryService:
         """
         if not self.sock:
             return
-        # Build response with our identity and TCP endpoint.
-        message = {
-            "type": "discovery_response",
-            "device_id": get_device_id(),
-            "device_name": get_device_name(),
-            "platform": get_platform(),
-            "ip": get_local_ip(),
-            "tcp_port": self.tcp_port,
-            "timestamp": get_timestamp(),
-        }
-        data = json.dumps(message, separators=(",", ":"), ensure_ascii=True).encode("utf-8")
+        # Response with our identity and TCP endpoint.
+        data = self._packet("discovery_response")
         try:
             # Send directly to requester; no broadcast.
             self.sock.sendto(data, (ip, DISCOVERY_PORT))
         except OSError:
             # Network error; silently continue.
             pass
+
+    def _packet(self, msg_type: str) -> bytes:
+        """Return the encoded discovery packet of msg_type.
+        
+        Reason: Only ip and timestamp ever change. Everything before the
+        timestamp (the last field) is encoded once per IP and cached; each
+        packet is that prefix plus the integer timestamp and closing brace.
+        """
+        ip = self._local_ip
+        cached = self._prefixes.get(msg_type)
+        if cached is not None and cached[0] == ip:
+            prefix = cached[1]
+        else:
+            message = {
+                "type": msg_type,
+                **self._identity,
+                "ip": ip,
+                "tcp_port": self.tcp_port,
+            }
+            # Compact JSON minus its closing brace, open for the timestamp.
+            prefix = json_dumps(message)[:-1] + b',"timestamp":'
+            # One tuple store; readers on other threads see old or new, never mixed.
+            self._prefixes[msg_type] = (ip, prefix)
+        return prefix + str(get_timestamp()).encode("ascii") + b"}"
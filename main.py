@@ -9,8 +9,10 @@ Rationale:
 - All state kept in callbacks/storage to simplify porting to mobile.
 """
 
+import queue
 import threading
 
+from binary_protocol import CHECKSUM_CRC16
 from discovery import DiscoveryService
 from connection_manager import ConnectionManager
 from utils import get_device_id, get_device_name
@@ -26,6 +28,26 @@ def main() -> None:
     discovered = {}
     lock = threading.Lock()  # Protects discovered dict from race conditions.
 
+    # Console output from network callbacks, printed by one printer thread.
+    # Reason: Callbacks run on the reactor thread; a slow or busy terminal
+    # must never stall socket reads. None stops the printer.
+    notices: "queue.SimpleQueue" = queue.SimpleQueue()
+
+    def print_notices() -> None:
+        while True:
+            batch = [notices.get()]
+            # Coalesce everything queued meanwhile into one write.
+            while not notices.empty():
+                batch.append(notices.get())
+            lines = [line for line in batch if line is not None]
+            if lines:
+                print("\n".join(lines))
+            if len(lines) < len(batch):
+                return
+
+    printer = threading.Thread(target=print_notices, daemon=True)
+    printer.start()
+
     def on_device(info):
         device_id = info.get("device_id")
         if not device_id:
@@ -34,7 +56,7 @@ def main() -> None:
             is_new = device_id not in discovered
             discovered[device_id] = info
         if is_new:
-            print(
+            notices.put(
                 f"\ndiscovered: {device_id} {info.get('device_name')} "
                 f"{info.get('ip')}:{info.get('tcp_port')}"
             )
@@ -43,11 +65,11 @@ def main() -> None:
     # Reason: Event-driven architecture decouples networking from UI updates.
     def on_text(peer_id: str, text: str) -> None:
         """Handle incoming direct messages. Prints to console for visibility."""
-        print(f"\n[{peer_id}] {text}")
+        notices.put(f"\n[{peer_id}] {text}")
 
     def on_file(peer_id: str, path: str) -> None:
         """Notify user when file transfer completes. Path shows where it's saved."""
-        print(f"\n[{peer_id}] file received: {path}")
+        notices.put(f"\n[{peer_id}] file received: {path}")
 
     # Track pending group invites locally so user can accept/reject by group_id.
     # Reason: Invites are transient and don't need persistent storage.
@@ -55,7 +77,7 @@ def main() -> None:
 
     def on_group(peer_id: str, group_id: str, text: str) -> None:
         """Display group messages with clear group context for multi-group scenarios."""
-        print(f"\n[group {group_id}] {peer_id}: {text}")
+        notices.put(f"\n[group {group_id}] {peer_id}: {text}")
 
     def on_group_invite(group_id: str, name: str, master_id: str, inviter_id: str) -> None:
         """Cache invite and prompt user to accept/reject.
@@ -67,23 +89,23 @@ def main() -> None:
             "master_id": master_id,
             "inviter_id": inviter_id,
         }
-        print(
+        notices.put(
             f"\ninvite: group={group_id} name={name} "
-            f"master={master_id} from={inviter_id}"
+            f"master={master_id} from={inviter_id}\n"
+            "use: group_accept <group_id> or group_reject <group_id>"
         )
-        print("use: group_accept <group_id> or group_reject <group_id>")
 
     def on_group_notice(text: str) -> None:
         """Generic group operation feedback (invites sent, joins, errors)."""
-        print(f"\n[group] {text}")
+        notices.put(f"\n[group] {text}")
 
     def on_peer_connected(peer_id: str, name: str) -> None:
         """Notify on new TCP peer connection for awareness."""
-        print(f"\nconnected: {peer_id} ({name})")
+        notices.put(f"\nconnected: {peer_id} ({name})")
 
     def on_peer_disconnected(peer_id: str) -> None:
         """Notify on peer disconnect; helps diagnose network issues."""
-        print(f"\ndisconnected: {peer_id}")
+        notices.put(f"\ndisconnected: {peer_id}")
 
     # Core services: storage, connections, discovery.
     # Reason: Separate concerns; storage is independent of network layer.
@@ -104,13 +126,209 @@ def main() -> None:
 
     # Start UDP broadcast discovery in parallel.
     # Reason: Passive discovery allows peers to find each other without manual IP entry.
-    discovery = DiscoveryService(TCP_PORT, on_device)
+    # It shares the connection reactor's select() thread.
+    discovery = DiscoveryService(TCP_PORT, on_device, manager.reactor)
     discovery.start()
 
     print("LynkLAN PC client")
     print(f"Device: {get_device_name()} ({get_device_id()})")
     print("Type 'help' for commands.")
 
+    # Command handlers; each takes the text after the command word.
+    # Reason: One dict lookup dispatches a command, and each handler
+    # splits only the arguments it needs.
+    def cmd_help(args: str) -> None:
+        print("commands:")
+        print("  peers")
+        print("  discoveries")
+        print("  connect <ip> <port>")
+        print("  connect_discovered <device_id>")
+        print("  msg <peer_id> <text>")
+        print("  history <peer_id>")
+        print("  groups")
+        print("  group_create <name>")
+        print("  group_invite <group_id> <peer_id,peer_id,...>")
+        print("  group_accept <group_id>")
+        print("  group_reject <group_id>")
+        print("  group_send <group_id> <text>")
+        print("  group_history <group_id>")
+        print("  sendfile <peer_id> <path>")
+        print("  sendfile_fast <peer_id> <path>")
+        print("  quit")
+
+    def cmd_peers(args: str) -> None:
+        peers = manager.get_peers()
+        if not peers:
+            print("no peers")
+            return
+        # Listings are joined and printed once: one stdout write, not one per row.
+        lines = []
+        for peer_id, peer in peers.items():
+            name = peer.device_name or "unknown"
+            lines.append(f"{peer_id} {name}")
+        print("\n".join(lines))
+
+    def cmd_discoveries(args: str) -> None:
+        with lock:
+            # Format under the lock, print after releasing it.
+            lines = [
+                f"{device_id} {info.get('device_name')} "
+                f"{info.get('ip')}:{info.get('tcp_port')}"
+                for device_id, info in discovered.items()
+            ]
+        print("\n".join(lines) if lines else "no discoveries")
+
+    def cmd_groups(args: str) -> None:
+        groups = store.get_groups()
+        if not groups:
+            print("no groups")
+            return
+        lines = []
+        for group_id, info in groups.items():
+            name = info.get("name", "group")
+            master = info.get("master_id", "unknown")
+            members = ",".join(info.get("members", []))
+            lines.append(f"{group_id} {name} master={master} members={members}")
+        print("\n".join(lines))
+
+    def cmd_connect_discovered(device_id: str) -> None:
+        if not device_id:
+            print("usage: connect_discovered <device_id>")
+            return
+        with lock:
+            info = discovered.get(device_id)
+        if not info:
+            print("device not found")
+            return
+        if not manager.connect_to(info.get("ip"), int(info.get("tcp_port"))):
+            print("connect failed")
+
+    def cmd_connect(args: str) -> None:
+        parts = args.split(" ")
+        if len(parts) != 2:
+            print("usage: connect <ip> <port>")
+            return
+        ip, port = parts
+        if not manager.connect_to(ip, int(port)):
+            print("connect failed")
+
+    def cmd_msg(args: str) -> None:
+        peer_id, _, text = args.partition(" ")
+        if not text:
+            print("usage: msg <peer_id> <text>")
+            return
+        manager.send_text(peer_id, text)
+
+    def cmd_history(peer_id: str) -> None:
+        if not peer_id:
+            print("usage: history <peer_id>")
+            return
+        entries = store.read_direct(peer_id)
+        if not entries:
+            print("no history")
+            return
+        lines = []
+        for entry in entries:
+            text = entry.get("payload", {}).get("text", "")
+            ts = entry.get("timestamp", "")
+            lines.append(f"{ts} {peer_id}: {text}")
+        print("\n".join(lines))
+
+    def cmd_group_create(name: str) -> None:
+        if not name:
+            print("usage: group_create <name>")
+            return
+        group_id = manager.create_group(name)
+        print(f"group created: {group_id}")
+
+    def cmd_group_invite(args: str) -> None:
+        group_id, _, raw_members = args.partition(" ")
+        if not raw_members:
+            print("usage: group_invite <group_id> <peer_id,peer_id,...>")
+            return
+        members = {p for p in raw_members.split(",") if p}
+        manager.invite_to_group(group_id, members)
+
+    def cmd_group_accept(group_id: str) -> None:
+        if not group_id:
+            print("usage: group_accept <group_id>")
+            return
+        invite = pending_invites.get(group_id)
+        if not invite:
+            print("no pending invite")
+            return
+        manager.accept_group_invite(group_id, invite["master_id"], invite["name"])
+        pending_invites.pop(group_id, None)
+
+    def cmd_group_reject(group_id: str) -> None:
+        if not group_id:
+            print("usage: group_reject <group_id>")
+            return
+        invite = pending_invites.get(group_id)
+        if not invite:
+            print("no pending invite")
+            return
+        manager.reject_group_invite(group_id, invite["master_id"])
+        pending_invites.pop(group_id, None)
+
+    def cmd_group_send(args: str) -> None:
+        group_id, _, text = args.partition(" ")
+        if not text:
+            print("usage: group_send <group_id> <text>")
+            return
+        manager.send_group_message(group_id, text)
+
+    def cmd_group_history(group_id: str) -> None:
+        if not group_id:
+            print("usage: group_history <group_id>")
+            return
+        entries = store.read_group(group_id)
+        if not entries:
+            print("no group history")
+            return
+        lines = []
+        for entry in entries:
+            text = entry.get("payload", {}).get("text", "")
+            sender = entry.get("device_id", "unknown")
+            ts = entry.get("timestamp", "")
+            lines.append(f"{ts} {sender}: {text}")
+        print("\n".join(lines))
+
+    def cmd_sendfile(args: str) -> None:
+        peer_id, _, path = args.partition(" ")
+        if not path:
+            print("usage: sendfile <peer_id> <path>")
+            return
+        manager.send_file(peer_id, path)
+
+    def cmd_sendfile_fast(args: str) -> None:
+        # Transient in-session transfer: CRC-16 trailers when the peer
+        # advertised them (TCP still checksums every segment), else CRC32.
+        peer_id, _, path = args.partition(" ")
+        if not path:
+            print("usage: sendfile_fast <peer_id> <path>")
+            return
+        manager.send_file(peer_id, path, CHECKSUM_CRC16)
+
+    commands = {
+        "help": cmd_help,
+        "peers": cmd_peers,
+        "discoveries": cmd_discoveries,
+        "groups": cmd_groups,
+        "connect_discovered": cmd_connect_discovered,
+        "connect": cmd_connect,
+        "msg": cmd_msg,
+        "history": cmd_history,
+        "group_create": cmd_group_create,
+        "group_invite": cmd_group_invite,
+        "group_accept": cmd_group_accept,
+        "group_reject": cmd_group_reject,
+        "group_send": cmd_group_send,
+        "group_history": cmd_group_history,
+        "sendfile": cmd_sendfile,
+        "sendfile_fast": cmd_sendfile_fast,
+    }
+
     # Command loop for local interaction.
     # Reason: Blocking input is fine for CLI; async not needed here.
     while True:
@@ -121,201 +339,23 @@ def main() -> None:
             break
         if not line:
             continue
-
-        if line == "help":
-            print("commands:")
-            print("  peers")
-            print("  discoveries")
-            print("  connect <ip> <port>")
-            print("  connect_discovered <device_id>")
-            print("  msg <peer_id> <text>")
-            print("  history <peer_id>")
-            print("  groups")
-            print("  group_create <name>")
-            print("  group_invite <group_id> <peer_id,peer_id,...>")
-            print("  group_accept <group_id>")
-            print("  group_reject <group_id>")
-            print("  group_send <group_id> <text>")
-            print("  group_history <group_id>")
-            print("  sendfile <peer_id> <path>")
-            print("  quit")
-            continue
-
-        if line == "peers":
-            peers = manager.get_peers()
-            if not peers:
-                print("no peers")
-                continue
-            for peer_id, peer in peers.items():
-                name = peer.device_name or "unknown"
-                print(f"{peer_id} {name}")
-            continue
-
-        if line == "discoveries":
-            with lock:
-                if not discovered:
-                    print("no discoveries")
-                    continue
-                for device_id, info in discovered.items():
-                    print(
-                        f"{device_id} {info.get('device_name')} "
-                        f"{info.get('ip')}:{info.get('tcp_port')}"
-                    )
-            continue
-
-        if line == "groups":
-            groups = store.get_groups()
-            if not groups:
-                print("no groups")
-                continue
-            for group_id, info in groups.items():
-                name = info.get("name", "group")
-                master = info.get("master_id", "unknown")
-                members = ",".join(info.get("members", []))
-                print(f"{group_id} {name} master={master} members={members}")
-            continue
-
-        if line.startswith("connect_discovered "):
-            _, device_id = line.split(" ", 1)
-            with lock:
-                info = discovered.get(device_id)
-            if not info:
-                print("device not found")
-                continue
-            if not manager.connect_to(info.get("ip"), int(info.get("tcp_port"))):
-                print("connect failed")
-            continue
-
-        if line.startswith("connect "):
-            parts = line.split(" ")
-            if len(parts) != 3:
-                print("usage: connect <ip> <port>")
-                continue
-            ip = parts[1]
-            port = int(parts[2])
-            if not manager.connect_to(ip, port):
-                print("connect failed")
-            continue
-
-        if line.startswith("msg "):
-            parts = line.split(" ", 2)
-            if len(parts) < 3:
-                print("usage: msg <peer_id> <text>")
-                continue
-            peer_id = parts[1]
-            text = parts[2]
-            manager.send_text(peer_id, text)
-            continue
-
-        if line.startswith("history "):
-            parts = line.split(" ", 1)
-            if len(parts) != 2:
-                print("usage: history <peer_id>")
-                continue
-            peer_id = parts[1]
-            entries = store.read_direct(peer_id)
-            if not entries:
-                print("no history")
-                continue
-            for entry in entries:
-                text = entry.get("payload", {}).get("text", "")
-                ts = entry.get("timestamp", "")
-                print(f"{ts} {peer_id}: {text}")
-            continue
-
-        if line.startswith("group_create "):
-            parts = line.split(" ", 1)
-            if len(parts) != 2:
-                print("usage: group_create <name>")
-                continue
-            name = parts[1]
-            group_id = manager.create_group(name)
-            print(f"group created: {group_id}")
-            continue
-
-        if line.startswith("group_invite "):
-            parts = line.split(" ", 2)
-            if len(parts) != 3:
-                print("usage: group_invite <group_id> <peer_id,peer_id,...>")
-                continue
-            group_id = parts[1]
-            raw_members = [p for p in parts[2].split(",") if p]
-            members = set(raw_members)
-            manager.invite_to_group(group_id, members)
-            continue
-
-        if line.startswith("group_accept "):
-            parts = line.split(" ", 1)
-            if len(parts) != 2:
-                print("usage: group_accept <group_id>")
-                continue
-            group_id = parts[1]
-            invite = pending_invites.get(group_id)
-            if not invite:
-                print("no pending invite")
-                continue
-            manager.accept_group_invite(group_id, invite["master_id"], invite["name"])
-            pending_invites.pop(group_id, None)
-            continue
-
-        if line.startswith("group_reject "):
-            parts = line.split(" ", 1)
-            if len(parts) != 2:
-                print("usage: group_reject <group_id>")
-                continue
-            group_id = parts[1]
-            invite = pending_invites.get(group_id)
-            if not invite:
-                print("no pending invite")
-                continue
-            manager.reject_group_invite(group_id, invite["master_id"])
-            pending_invites.pop(group_id, None)
-            continue
-
-        if line.startswith("group_send "):
-            parts = line.split(" ", 2)
-            if len(parts) < 3:
-                print("usage: group_send <group_id> <text>")
-                continue
-            group_id = parts[1]
-            text = parts[2]
-            manager.send_group_message(group_id, text)
-            continue
-
-        if line.startswith("group_history "):
-            parts = line.split(" ", 1)
-            if len(parts) != 2:
-                print("usage: group_history <group_id>")
-                continue
-            group_id = parts[1]
-            entries = store.read_group(group_id)
-            if not entries:
-                print("no group history")
-                continue
-            for entry in entries:
-                text = entry.get("payload", {}).get("text", "")
-                sender = entry.get("device_id", "unknown")
-                ts = entry.get("timestamp", "")
-                print(f"{ts} {sender}: {text}")
-            continue
-
-        if line.startswith("sendfile "):
-            parts = line.split(" ", 2)
-            if len(parts) < 3:
-                print("usage: sendfile <peer_id> <path>")
-                continue
-            peer_id = parts[1]
-            path = parts[2]
-            manager.send_file(peer_id, path)
-            continue
-
         if line == "quit":
             break
 
-        print("unknown command")
+        # Split off the command word once; handlers parse the rest.
+        cmd, _, args = line.partition(" ")
+        handler = commands.get(cmd)
+        if handler is None:
+            print("unknown command")
+            continue
+        handler(args)
 
     discovery.stop()
     manager.stop()
+    store.close()
+    # Let the printer flush notices raised during shutdown.
+    notices.put(None)
+    printer.join(timeout=1.0)
 
 
 if __name__ == "__main__":
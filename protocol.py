@@ -15,11 +15,54 @@ Rationale:
 - Big-endian ('>I') ensures cross-platform compatibility (Windows/Linux/Android/iOS).
 - JSON chosen for readability and easy extension of new message types.
 - Hybrid approach: JSON for clarity where we need it, binary where we need speed.
+- orjson (optional) encodes to and parses from bytes directly, several times
+  faster than the stdlib; json is the fallback. orjson.JSONDecodeError
+  subclasses json.JSONDecodeError, so callers catch one exception type.
+- Exact reads pass MSG_WAITALL so the kernel returns a whole message in one
+  recv_into; the loop only runs again after a signal, timeout or EOF.
 """
 
 import json
-import struct
-from typing import Any, Dict, Optional, Tuple
+import socket
+from typing import Any, Dict, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; stdlib json below.
+    orjson = None
+
+# Block in the kernel until the full request arrives (0 where unsupported).
+RECV_WAITALL = getattr(socket, "MSG_WAITALL", 0)
+# Compact stdlib encoder, built once. Reason: json.dumps with non-default
+# separators constructs a new JSONEncoder on every call.
+_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=True)
+
+
+def json_dumps(message: Dict[str, Any]) -> bytes:
+    """Serialize message to compact UTF-8 JSON bytes.
+    
+    Reason: orjson returns bytes directly (no str round trip); the stdlib
+    fallback produces equivalent JSON, so peers parse either.
+    """
+    if orjson is not None:
+        # OPT_NON_STR_KEYS matches json.dumps, which stringifies int keys.
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS)
+    return _JSON_ENCODER.encode(message).encode("utf-8")
+
+
+def json_loads(data: Union[bytes, bytearray, memoryview]) -> Any:
+    """Parse UTF-8 JSON straight from a received buffer.
+    
+    Raises:
+        json.JSONDecodeError: Malformed JSON or invalid UTF-8
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    try:
+        return json.loads(bytes(data).decode("utf-8"))
+    except UnicodeDecodeError as exc:
+        # Report bad encoding the same way orjson does.
+        raise json.JSONDecodeError(str(exc), "", 0) from exc
 
 
 def encode_message(message: Dict[str, Any]) -> bytes:
@@ -28,54 +71,91 @@ def encode_message(message: Dict[str, Any]) -> bytes:
     Format: [4-byte length][JSON bytes]
     Reason: Receiver knows exactly how many bytes to read for one message.
     """
+    return b"".join(encode_message_parts(message))
+
+
+def encode_message_parts(message: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Encode a JSON message as (4-byte length prefix, JSON bytes).
+    
+    Reason: Scatter-gather writers (sendmsg) send both parts in one
+    syscall, so the body is never copied behind its prefix.
+    """
     # Compact JSON to save bandwidth.
-    data = json.dumps(message, separators=(",", ":"), ensure_ascii=True).encode("utf-8")
-    # Pack length as 4-byte big-endian unsigned integer.
-    length = struct.pack(">I", len(data))
-    return length + data
+    data = json_dumps(message)
+    # 4-byte big-endian unsigned length; int.to_bytes skips struct's
+    # format lookup and result tuple.
+    return len(data).to_bytes(4, "big"), data
 
 
 def read_exact(sock, num_bytes: int) -> Optional[bytes]:
     """Read an exact number of bytes or return None on disconnect.
     
-    Reason: TCP recv() may return less than requested; we loop until complete.
-    Empty chunk signals clean disconnect.
+    Reason: TCP recv() may return less than requested; recv_exact_into
+    loops until complete. Empty chunk signals clean disconnect.
+    """
+    buffer = bytearray(num_bytes)
+    if not recv_exact_into(sock, buffer):
+        # Peer closed connection cleanly.
+        return None
+    return bytes(buffer)
+
+
+def recv_exact_into(sock, buffer: Union[bytearray, memoryview]) -> bool:
+    """Fill buffer completely from sock; return False on disconnect.
+    
+    Reason: recv_into writes straight into the caller's buffer, so no
+    per-recv bytes objects are created and joined. With MSG_WAITALL a
+    blocking socket fills it in one call; short reads (signal, timeout
+    socket, EOF) resume in the loop.
     """
-    chunks = []
-    bytes_read = 0
-    while bytes_read < num_bytes:
-        # Request remaining bytes.
-        chunk = sock.recv(num_bytes - bytes_read)
-        if not chunk:
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        received = sock.recv_into(view[filled:], 0, RECV_WAITALL)
+        if not received:
             # Peer closed connection cleanly.
-            return None
-        chunks.append(chunk)
-        bytes_read += len(chunk)
-    # Reassemble all chunks into single bytestring.
-    return b"".join(chunks)
+            return False
+        filled += received
+    return True
 
 
-def read_message(sock) -> Optional[Dict[str, Any]]:
+def read_message(sock, buffer: Optional[bytearray] = None) -> Optional[Dict[str, Any]]:
     """Read a single length-prefixed JSON message from a socket.
     
     Reason: Two-phase read (length then payload) ensures we never read
     partial messages or consume data from the next message.
+    
+    Args:
+        buffer: Optional scratch buffer reused across calls; grown when
+            a message (or the 4-byte prefix) does not fit. The message is
+            parsed out of it before returning, so nothing references it
+            afterwards.
     """
+    if buffer is None:
+        buffer = bytearray(4)
+    elif len(buffer) < 4:
+        # The length prefix is always read into the first 4 bytes.
+        buffer.extend(bytes(4 - len(buffer)))
+    view = memoryview(buffer)
     # Phase 1: Read 4-byte length prefix.
-    length_bytes = read_exact(sock, 4)
-    if not length_bytes:
+    if not recv_exact_into(sock, view[:4]):
         # Connection closed before length arrived.
         return None
-    # Unpack big-endian unsigned int.
-    length = struct.unpack(">I", length_bytes)[0]
-    # Phase 2: Read exact payload bytes.
-    data = read_exact(sock, length)
-    if data is None:
+    # Big-endian unsigned int; no format string to parse for a lone field.
+    length = int.from_bytes(view[:4], "big")
+    if length > len(buffer):
+        # Grow once; later messages up to this size reuse the space.
+        view.release()
+        buffer.extend(bytes(length - len(buffer)))
+        view = memoryview(buffer)
+    # Phase 2: Read exact payload bytes into the (reused) buffer.
+    data = view[:length]
+    if not recv_exact_into(sock, data):
         # Connection closed mid-message.
         return None
     try:
-        # Decode UTF-8 JSON.
-        return json.loads(data.decode("utf-8"))
+        # Decode UTF-8 JSON straight from the buffer slice.
+        return json_loads(data)
     except json.JSONDecodeError:
         # Malformed JSON; treat as protocol error.
         return None
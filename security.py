@@ -10,7 +10,7 @@ Rationale:
 """
 
 import hmac
-import hashlib
+import json
 from typing import Dict, Any
 
 
@@ -18,10 +18,11 @@ def sign_message(secret: str, message: Dict[str, Any]) -> str:
     """Return an HMAC signature for a message dict.
     
     Reason: Prevents tampering; receiver with same secret can verify.
-    Uses string representation of dict (deterministic with sorted keys).
+    Signs canonical JSON (sorted keys, compact, ASCII-escaped), so every
+    peer derives the same bytes from the same message.
     """
-    # Convert message to bytes; str() is simple but fragile.
-    # TODO: Use canonical JSON for production.
-    payload = str(message).encode("utf-8")
-    # Compute HMAC-SHA256 and return hex digest.
-    return hmac.new(secret.encode("utf-8"), payload, hashlib.sha256).hexdigest()
+    # Standard json on purpose: orjson (when installed) does not escape
+    # non-ASCII, so peers with and without it would sign different bytes.
+    payload = json.dumps(message, sort_keys=True, separators=(",", ":")).encode("ascii")
+    # One-shot HMAC-SHA256 (single C call, no HMAC object) as hex.
+    return hmac.digest(secret.encode("utf-8"), payload, "sha256").hex()
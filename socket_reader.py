@@ -0,0 +1,286 @@
+"""Buffered receive path for peer sockets.
+
+The per-peer read loop used to issue one recv() per frame fragment: the
+length prefix, then the payload, each often split across several syscalls.
+This module reads large slabs from the socket and peels complete frames out
+of them, so several small frames (or a frame header and its data) cost one
+kernel round trip instead of two or three.
+
+Rationale:
+- Slabs are recycled through a small pool; no per-read allocation of 2 MB.
+- A receive lands in the free tail of the last slab while that is large
+  enough, so a peer trickling tiny sends keeps one slab busy, not one
+  slab per send. Slab bytes held per reader are capped (MAX_HELD_BYTES).
+- Once a frame's length is known and the frame is incomplete, the rest is
+  received straight into a payload buffer of exactly that size, skipping
+  the slab copy; slabs only ever hold complete frames and a partial
+  length prefix.
+- Driven by PeerReactor readiness: receive_once() never blocks and
+  iter_frames() never receives.
+- Plain recv_into only, no io_uring: after a readiness event one recv
+  already drains what the kernel has queued, so a ring would not save a
+  syscall on this path.
+- No registered (IORING_REGISTER_BUFFERS) slabs either: pinning saves
+  work only per io_uring read, and the liburing binding waits for
+  completions with the GIL held. recv_into on a ready socket never blocks
+  and runs with the GIL released.
+"""
+
+import socket
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Tuple
+
+# Size of each receive slab; matches the binary protocol's 2 MB chunk size.
+SLAB_SIZE = 2 * 1024 * 1024
+# Slabs kept for reuse per reader (a receive tops up at most two at once).
+SLAB_POOL_SIZE = 2
+# A slab's free tail takes the next receive while at least this large.
+TAIL_RECV_MIN = 64 * 1024
+# Slab bytes a reader may hold for buffered data. Incomplete frames move to
+# their own buffer, so only a burst of complete frames gets near this.
+MAX_HELD_BYTES = 4 * SLAB_SIZE
+
+
+class SocketReader:
+    """Buffered exact-length reader over a blocking socket.
+
+    Reason: Serving reads from a large slab collapses many small recv()
+    calls into one.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        # Filled slabs not yet consumed: (slab, start, end).
+        self._fragments: Deque[Tuple[bytearray, int, int]] = deque()
+        self._buffered = 0
+        self._pool: List[bytearray] = []
+        # Bytes of slabs taken from the pool and not yet released.
+        self._held = 0
+        # Large frame being received in place: payload buffer and bytes filled.
+        self._direct: Optional[bytearray] = None
+        self._direct_filled = 0
+
+    @property
+    def held_bytes(self) -> int:
+        """Memory pinned by buffered data: busy slabs plus any direct buffer."""
+        direct = len(self._direct) if self._direct is not None else 0
+        return self._held + direct
+
+    def _take_slab(self) -> bytearray:
+        if self._held + SLAB_SIZE > MAX_HELD_BYTES:
+            raise ValueError(f"receive buffer exceeds {MAX_HELD_BYTES} bytes")
+        self._held += SLAB_SIZE
+        return self._pool.pop() if self._pool else bytearray(SLAB_SIZE)
+
+    def _release_slab(self, slab: bytearray) -> None:
+        self._held -= SLAB_SIZE
+        if len(self._pool) < SLAB_POOL_SIZE:
+            self._pool.append(slab)
+
+    def _receive_more(self) -> bool:
+        if self._fragments:
+            slab, start, end = self._fragments[-1]
+            if len(slab) - end >= TAIL_RECV_MIN:
+                # Top up the last slab instead of pinning another one.
+                received = self.sock.recv_into(memoryview(slab)[end:])
+                if received <= 0:
+                    return False
+                self._fragments[-1] = (slab, start, end + received)
+                self._buffered += received
+                return True
+        slab = self._take_slab()
+        received = self.sock.recv_into(slab)
+        if received <= 0:
+            self._release_slab(slab)
+            return False
+        self._fragments.append((slab, 0, received))
+        self._buffered += received
+        return True
+
+    def read_exact(self, num_bytes: int) -> Optional[bytearray]:
+        """Read exactly num_bytes, or return None if the peer disconnected.
+
+        Reason: Buffered bytes are copied out first; the rest is received
+        straight into the result, so a large read never pins slabs.
+
+        Args:
+            num_bytes: Number of bytes to return
+
+        Returns:
+            bytearray of length num_bytes, or None on disconnect
+
+        Raises:
+            OSError: Socket error from the underlying receive
+        """
+        out = bytearray(num_bytes)
+        view = memoryview(out)
+        filled = min(self._buffered, num_bytes)
+        if filled:
+            self._copy_into(view, filled)
+        while filled < num_bytes:
+            received = self.sock.recv_into(view[filled:])
+            if received <= 0:
+                return None
+            filled += received
+        return out
+
+    def _copy_into(self, out: memoryview, num_bytes: int) -> None:
+        """Move num_bytes (all buffered) from the fragments into out."""
+        filled = 0
+        while filled < num_bytes:
+            slab, start, end = self._fragments[0]
+            take = min(end - start, num_bytes - filled)
+            out[filled:filled + take] = memoryview(slab)[start:start + take]
+            filled += take
+            if start + take == end:
+                # Slab fully consumed; hand it back to the pool.
+                self._fragments.popleft()
+                self._release_slab(slab)
+            else:
+                self._fragments[0] = (slab, start + take, end)
+        self._buffered -= num_bytes
+
+    def _consume(self, num_bytes: int) -> None:
+        """Drop num_bytes already buffered in the first fragment."""
+        slab, start, end = self._fragments[0]
+        if start + num_bytes == end:
+            self._fragments.popleft()
+            self._release_slab(slab)
+        else:
+            self._fragments[0] = (slab, start + num_bytes, end)
+        self._buffered -= num_bytes
+
+    def read_frame(self, max_length: int) -> Optional[bytearray]:
+        """Read one length-prefixed frame and return its payload.
+
+        Reason: The 4-byte prefix is parsed in place from the slab (no
+        intermediate buffer), and on warm connections both prefix and
+        payload are usually served from one earlier receive.
+
+        Args:
+            max_length: Largest payload accepted (guards the allocation)
+
+        Returns:
+            Payload bytearray (empty for a zero-length frame), or None on disconnect
+
+        Raises:
+            ValueError: If the announced length exceeds max_length
+            OSError: Socket error from the underlying receive
+        """
+        while self._buffered < 4:
+            if not self._receive_more():
+                return None
+        slab, start, end = self._fragments[0]
+        if end - start >= 4:
+            # Common case: the whole prefix sits in the first fragment.
+            length = int.from_bytes(slab[start:start + 4], "big")
+            self._consume(4)
+        else:
+            prefix = self.read_exact(4)
+            if prefix is None:
+                return None
+            length = int.from_bytes(prefix, "big")
+        if length > max_length:
+            raise ValueError(f"frame length {length} exceeds {max_length}")
+        return self.read_exact(length)
+
+    def receive_once(self) -> bool:
+        """Perform exactly one receive into the buffer.
+
+        Reason: For selector-driven readers; after a readiness event one
+        receive never blocks, and next_frame() then peels what arrived.
+
+        Returns:
+            False if the peer closed the connection, True otherwise
+
+        Raises:
+            OSError: Socket error from the underlying receive
+        """
+        if self._direct is not None:
+            # Mid large frame: land bytes directly in its payload buffer.
+            received = self.sock.recv_into(memoryview(self._direct)[self._direct_filled:])
+            if received <= 0:
+                return False
+            self._direct_filled += received
+            return True
+        return self._receive_more()
+
+    def next_frame(self, max_length: int) -> Optional[bytearray]:
+        """Return the next complete length-prefixed payload, or None.
+
+        Never receives: None means the buffer does not yet hold a whole
+        frame (call receive_once when the socket is readable again).
+
+        Raises:
+            ValueError: If the announced length exceeds max_length
+        """
+        if self._direct is not None:
+            if self._direct_filled < len(self._direct):
+                return None
+            payload = self._direct
+            self._direct = None
+            return payload
+        if self._buffered < 4:
+            return None
+        slab, start, end = self._fragments[0]
+        if end - start >= 4:
+            length = int.from_bytes(slab[start:start + 4], "big")
+        else:
+            # Prefix split across slabs; gather it without consuming.
+            prefix = bytearray()
+            for frag_slab, frag_start, frag_end in self._fragments:
+                prefix += frag_slab[frag_start:min(frag_end, frag_start + 4 - len(prefix))]
+                if len(prefix) == 4:
+                    break
+            length = int.from_bytes(prefix, "big")
+        if length > max_length:
+            raise ValueError(f"frame length {length} exceeds {max_length}")
+        if self._buffered < 4 + length:
+            # Switch to in-place receive: move what is buffered into a
+            # right-sized payload buffer, then receive_once() fills the rest
+            # without touching a slab (or keeping one alive for it).
+            self._consume_prefix()
+            self._direct = bytearray(length)
+            self._direct_filled = self._buffered
+            self._copy_into(memoryview(self._direct), self._buffered)
+            return None
+        if end - start >= 4 + length:
+            # Whole frame in one fragment: one slice copy, prefix already parsed.
+            payload = slab[start + 4:start + 4 + length]
+            self._consume(4 + length)
+            return payload
+        return self.read_frame(max_length)
+
+    def _consume_prefix(self) -> None:
+        """Drop a 4-byte length prefix, even if split across fragments."""
+        remaining = 4
+        while remaining:
+            _slab, start, end = self._fragments[0]
+            take = min(end - start, remaining)
+            self._consume(take)
+            remaining -= take
+
+    def iter_frames(self, max_length: int) -> Iterator[bytearray]:
+        """Yield every complete length-prefixed payload already buffered.
+        
+        Reason: The reactor peels all frames after each receive; small
+        frames sitting together in one slab take the single-slice fast path
+        of next_frame. Never receives.
+        
+        Raises:
+            ValueError: If an announced length exceeds max_length (frames
+                before it have already been yielded)
+        """
+        while True:
+            frame = self.next_frame(max_length)
+            if frame is None:
+                return
+            yield frame
+
+    def close(self) -> None:
+        self._fragments.clear()
+        self._pool.clear()
+        self._buffered = 0
+        self._held = 0
+        self._direct = None
+
@@ -7,13 +7,26 @@ Rationale:
 - JSONL chosen for fast appends and easy tail reading.
 - Separate files per conversation prevent one huge file.
 - state.json holds groups because they require atomic updates.
+- Group records are copy-on-write: an update stores a new record (members
+  as a tuple) and never touches the old one, so readers get read-only
+  views without copying or locking.
+- state.json is written by a background thread, SAVE_DELAY after the
+  first change of a burst; close() writes anything still pending. A failed
+  write is logged and retried; close() retries once more synchronously and
+  raises if that fails too.
+- Log files stay open between appends (up to MAX_OPEN_LOGS), so a message
+  costs one write() instead of open/write/close.
 """
 
 import json
 import os
+import threading
 import time
 import uuid
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, BinaryIO, Dict, FrozenSet, List, Mapping, Optional, Sequence
+
+from protocol import json_dumps, json_loads
 
 # Local directory for all persisted data.
 DATA_DIR = "data"
@@ -22,10 +35,30 @@ STATE_FILE = os.path.join(DATA_DIR, "state.json")
 # Filename prefixes to distinguish direct vs group logs.
 DIRECT_PREFIX = "direct_"
 GROUP_PREFIX = "group_"
+# Bytes read from the end of a log for a history tail (doubled as needed).
+TAIL_WINDOW = 64 * 1024
+# Seconds a state change waits for others before state.json is written.
+SAVE_DELAY = 0.1
+# Seconds before a failed state.json write (disk full, EACCES) is retried.
+SAVE_RETRY_DELAY = 1.0
+# Log files kept open for appends; the least recently opened is closed first.
+MAX_OPEN_LOGS = 32
+
+
+# Set once DATA_DIR is known to exist.
+_dirs_ready = False
 
 
 def _ensure_dirs() -> None:
-    os.makedirs(DATA_DIR, exist_ok=True)
+    """Create DATA_DIR on first use.
+    
+    Reason: Every state save and new log handle calls this; after the first
+    success the makedirs stat() is skipped.
+    """
+    global _dirs_ready
+    if not _dirs_ready:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        _dirs_ready = True
 
 
 def _load_state() -> Dict[str, Any]:
@@ -49,22 +82,29 @@ def _load_state() -> Dict[str, Any]:
     return data
 
 
-def _save_state(state: Dict[str, Any]) -> None:
-    """Persist state atomically with pretty formatting.
+def _encode_state(state: Dict[str, Any]) -> str:
+    """Serialize state with pretty formatting.
     
     Reason: Indent for readability; sort_keys for reproducible diffs.
     """
-    _ensure_dirs()
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        # Pretty-print for manual inspection if needed.
-        json.dump(state, f, indent=2, sort_keys=True)
+    # Pretty-print for manual inspection if needed.
+    return json.dumps(state, indent=2, sort_keys=True)
 
 
-def _append_line(path: str, payload: Dict[str, Any]) -> None:
-    # JSONL keeps append-only history for cheap writes.
+def _save_state(text: str) -> None:
+    """Write serialized state to STATE_FILE atomically.
+    
+    Reason: The state goes to a temporary file that replaces STATE_FILE
+    only once it is fully on disk, so a crash mid-write leaves the previous
+    state intact instead of a truncated file _load_state would discard.
+    """
     _ensure_dirs()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(payload, ensure_ascii=True) + "\n")
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, STATE_FILE)
 
 
 def _read_lines(path: str, limit: int) -> List[Dict[str, Any]]:
@@ -76,22 +116,48 @@ def _read_lines(path: str, limit: int) -> List[Dict[str, Any]]:
     if not os.path.exists(path):
         # No history yet; return empty.
         return []
-    with open(path, "r", encoding="utf-8") as f:
-        # Read all lines into memory; OK for typical chat logs.
-        lines = f.readlines()
-    # Take last N lines if limit specified.
-    tail = lines[-limit:] if limit > 0 else lines
+    with open(path, "rb") as f:
+        if limit > 0:
+            lines = _tail_lines(f, limit)
+        else:
+            lines = f.read().splitlines()
     output = []
-    for line in tail:
+    for line in lines:
+        if not line:
+            # Blank line (e.g. a trailing newline); nothing to parse.
+            continue
         try:
-            # Parse each line as independent JSON object.
-            output.append(json.loads(line.strip()))
+            # Parse each line as independent JSON object, straight from
+            # bytes (orjson when installed).
+            output.append(json_loads(line))
         except json.JSONDecodeError:
-            # Corrupted line; skip silently.
+            # Corrupted or badly encoded line; skip silently.
             continue
     return output
 
 
+def _tail_lines(f: BinaryIO, limit: int) -> List[bytes]:
+    """Return the last limit lines of f, reading from the end.
+    
+    Reason: History shows the newest few messages; reading a window from
+    the end (doubled until it holds enough lines) costs O(limit), not
+    O(file size).
+    """
+    size = os.fstat(f.fileno()).st_size
+    window = TAIL_WINDOW
+    while True:
+        start = max(0, size - window)
+        f.seek(start)
+        lines = f.read(size - start).splitlines()
+        if start == 0:
+            # Whole file read; every line is complete.
+            return lines[-limit:]
+        # The first line may begin before the window; never use it.
+        if len(lines) > limit:
+            return lines[-limit:]
+        window *= 2
+
+
 class ChatStore:
     """Persisted storage for groups and message logs.
     
@@ -101,13 +167,122 @@ class ChatStore:
     def __init__(self) -> None:
         """Load existing state or initialize empty."""
         self.state = _load_state()
+        # group_id -> read-only view of its record, replaced wholesale (never
+        # mutated) whenever a group changes.
+        # Reason: get_groups/get_group hand it out without a lock or a copy.
+        self._group_views: Mapping[str, Mapping[str, Any]] = MappingProxyType({})
+        # group_id -> frozenset of members, rebuilt only when members change.
+        # Reason: Relays test membership per message; kept out of self.state
+        # because frozensets are not JSON-serializable.
+        self._member_sets: Dict[str, FrozenSet[str]] = {}
+        for group_id, group in list(self.state["groups"].items()):
+            record = dict(group)
+            # Loaded lists become tuples so no reader can mutate a record.
+            record["members"] = tuple(record.get("members", ()))
+            self._store_group(group_id, record, members_changed=True)
+        # path -> append handle, in opening order (oldest first).
+        # Reason: Messages are logged from the reactor and the CLI thread.
+        self._logs: Dict[str, BinaryIO] = {}
+        self._logs_lock = threading.Lock()
+        # Guards self.state: groups change on the reactor and CLI threads
+        # while the saver serializes it.
+        self._state_lock = threading.RLock()
+        # Set by save(); the saver thread writes state.json once per burst.
+        self._dirty = threading.Event()
+        self._closed = False
+        # Last state.json write failure, None once a write succeeds.
+        self._save_error: Optional[OSError] = None
+        self._saver = threading.Thread(target=self._save_loop, daemon=True)
+        self._saver.start()
+
+    def _store_group(self, group_id: str, record: Dict[str, Any], members_changed: bool) -> None:
+        """Install a new record for group_id (caller holds _state_lock or is __init__).
+        
+        Reason: Records are never mutated once stored; the state dict the
+        saver serializes and the published views both switch to the new one.
+        """
+        self.state["groups"][group_id] = record
+        views = dict(self._group_views)
+        views[group_id] = MappingProxyType(record)
+        self._group_views = MappingProxyType(views)
+        if members_changed:
+            self._member_sets[group_id] = frozenset(record["members"])
+
+    def close(self) -> None:
+        """Write pending state and close every open log file.
+        
+        Raises:
+            OSError: If state.json still cannot be written
+        """
+        self._closed = True
+        self._dirty.set()
+        self._saver.join()
+        try:
+            if self._save_error is not None:
+                # The saver's last attempt failed; one final synchronous try.
+                with self._state_lock:
+                    text = _encode_state(self.state)
+                _save_state(text)
+                self._save_error = None
+        finally:
+            with self._logs_lock:
+                for handle in self._logs.values():
+                    handle.close()
+                self._logs.clear()
+
+    def _append_line(self, path: str, payload: Dict[str, Any]) -> None:
+        """Append payload as one JSONL line.
+        
+        Reason: JSONL keeps append-only history for cheap writes. Each line
+        is flushed at once so readers (history commands) and crashes never
+        miss a logged message; only the open/close per append is saved.
+        """
+        line = json_dumps(payload) + b"\n"
+        with self._logs_lock:
+            handle = self._logs.get(path)
+            if handle is None:
+                _ensure_dirs()
+                if len(self._logs) >= MAX_OPEN_LOGS:
+                    # Close the longest-open log to bound file descriptors.
+                    self._logs.pop(next(iter(self._logs))).close()
+                handle = self._logs[path] = open(path, "ab")
+            handle.write(line)
+            handle.flush()
 
     def save(self) -> None:
-        """Flush in-memory state to disk.
+        """Schedule in-memory state to be written to disk.
         
         Reason: Explicit save avoids accidental data loss if process crashes.
+        Returns at once; the saver thread coalesces a burst of changes into
+        one write.
         """
-        _save_state(self.state)
+        self._dirty.set()
+
+    def _save_loop(self) -> None:
+        """Write state.json whenever save() was called (saver thread)."""
+        while True:
+            self._dirty.wait()
+            if not self._closed:
+                # Let the rest of a burst of changes land first.
+                time.sleep(SAVE_DELAY)
+            self._dirty.clear()
+            try:
+                with self._state_lock:
+                    text = _encode_state(self.state)
+                _save_state(text)
+            except OSError as e:
+                # Keep the thread alive: log, then retry the same state.
+                self._save_error = e
+                print(f"[storage error] could not write {STATE_FILE}: {e}")
+                if self._closed:
+                    # close() makes the final attempt and reports it.
+                    return
+                time.sleep(SAVE_RETRY_DELAY)
+                self._dirty.set()
+                continue
+            self._save_error = None
+            if self._closed:
+                return
 
     def create_group(self, name: str, members: List[str], master_id: str) -> str:
         """Create a new group and persist immediately.
@@ -116,28 +291,32 @@ class ChatStore:
         Epoch tracks master election to resolve conflicts.
         """
         group_id = str(uuid.uuid4())
-        self.state["groups"][group_id] = {
+        record = {
             "name": name,
-            "members": sorted(set(members)),  # De-duplicate and sort for consistency.
+            "members": tuple(sorted(set(members))),  # De-duplicate and sort for consistency.
             "master_id": master_id,
             "epoch": int(time.time()),  # Timestamp for master election logic.
         }
-        self.save()  # Persist immediately.
+        with self._state_lock:
+            self._store_group(group_id, record, members_changed=True)
+        self.save()  # Persist right after this burst.
         return group_id
 
     def upsert_group(
-        self, group_id: str, name: str, members: List[str], master_id: str, epoch: int
+        self, group_id: str, name: str, members: Sequence[str], master_id: str, epoch: int
     ) -> None:
         """Insert or replace group state.
         
         Reason: Used when joining via invite; remote master dictates state.
         """
-        self.state["groups"][group_id] = {
+        record = {
             "name": name,
-            "members": sorted(set(members)),
+            "members": tuple(sorted(set(members))),
             "master_id": master_id,
             "epoch": epoch,
         }
+        with self._state_lock:
+            self._store_group(group_id, record, members_changed=True)
         self.save()
 
     def update_group(self, group_id: str, update: Dict[str, Any]) -> None:
@@ -145,31 +324,47 @@ class ChatStore:
         
         Reason: Avoids re-specifying all fields when only updating master or members.
         """
-        group = self.state["groups"].get(group_id)
-        if not group:
-            # Group doesn't exist; silently ignore.
-            return
-        # Merge update into existing group.
-        group.update(update)
-        if "members" in group:
-            # Re-normalize members after update.
-            group["members"] = sorted(set(group["members"]))
+        with self._state_lock:
+            group = self.state["groups"].get(group_id)
+            if not group:
+                # Group doesn't exist; silently ignore.
+                return
+            # Merge update into a new record; the old one may be in use.
+            record = {**group, **update}
+            if "members" in update:
+                # Re-normalize members only when the caller changed them;
+                # stored tuples are already sorted and de-duplicated.
+                record["members"] = tuple(sorted(set(record["members"])))
+            self._store_group(group_id, record, members_changed="members" in update)
         self.save()
 
-    def get_groups(self) -> Dict[str, Dict[str, Any]]:
-        return dict(self.state.get("groups", {}))
+    def get_groups(self) -> Mapping[str, Mapping[str, Any]]:
+        """Return a read-only snapshot of all groups.
+        
+        Reason: The views are replaced, never mutated, on change, so callers
+        can iterate them on any thread with no lock and no copy.
+        """
+        return self._group_views
 
-    def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
-        group = self.state.get("groups", {}).get(group_id)
-        return dict(group) if group else None
+    def get_group(self, group_id: str) -> Optional[Mapping[str, Any]]:
+        """Return a read-only view of one group, or None."""
+        return self._group_views.get(group_id)
+
+    def get_members(self, group_id: str) -> FrozenSet[str]:
+        """Return the group's members as a shared immutable set.
+        
+        Reason: O(1) membership tests without rebuilding a set per message;
+        empty for unknown groups.
+        """
+        return self._member_sets.get(group_id, frozenset())
 
     def append_direct(self, peer_id: str, message: Dict[str, Any]) -> None:
         path = os.path.join(DATA_DIR, f"{DIRECT_PREFIX}{peer_id}.jsonl")
-        _append_line(path, message)
+        self._append_line(path, message)
 
     def append_group(self, group_id: str, message: Dict[str, Any]) -> None:
         path = os.path.join(DATA_DIR, f"{GROUP_PREFIX}{group_id}.jsonl")
-        _append_line(path, message)
+        self._append_line(path, message)
 
     def read_direct(self, peer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         path = os.path.join(DATA_DIR, f"{DIRECT_PREFIX}{peer_id}.jsonl")
@@ -7,22 +7,36 @@ Rationale:
 - Device ID persisted to file so it survives restarts.
 - Platform tag enables cross-platform feature detection.
 - Timestamp uses Unix epoch for universal compatibility.
+- Device ID and name are cached for the process; timestamp and local IP
+  are always live.
 """
 
+import functools
 import os
 import socket
 import uuid
 import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows; interface lookup falls back to hostname resolution.
+    fcntl = None
 
 # Persistent file storing this device's UUID.
 DEVICE_ID_FILE = "device_id.txt"
+# ioctl request for an interface's IPv4 address (Linux).
+SIOCGIFADDR = 0x8915
 
 
+@functools.lru_cache(maxsize=1)
 def get_device_id() -> str:
     """Load or generate a stable device UUID for this machine.
     
     Reason: Persisting ID ensures peer connections survive app restarts.
-    UUID chosen for uniqueness without coordination.
+    UUID chosen for uniqueness without coordination. Cached: the file is
+    read once per process.
     """
     if os.path.exists(DEVICE_ID_FILE):
         with open(DEVICE_ID_FILE, "r", encoding="utf-8") as f:
@@ -37,10 +51,12 @@ def get_device_id() -> str:
     return value
 
 
+@functools.lru_cache(maxsize=1)
 def get_device_name() -> str:
     """Return OS-provided hostname for display.
     
     Reason: Hostname is more user-friendly than UUID for identifying peers.
+    Cached like the device ID; peers see one name per session.
     """
     return socket.gethostname()
 
@@ -66,7 +82,10 @@ def get_local_ip() -> str:
     
     Reason: Connecting to external IP (without actually sending) forces
     OS to select the local interface used for LAN/internet routing.
-    Fallback to gethostbyname handles offline scenarios.
+    A LAN with no internet often has no default route, so that fails;
+    the first non-loopback interface address (Linux) is used next, and
+    hostname resolution last. Not cached: the address changes with the
+    network, and discovery re-reads it once per broadcast cycle to notice.
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
@@ -75,7 +94,39 @@ def get_local_ip() -> str:
         # Get local side of the "connection".
         return sock.getsockname()[0]
     except OSError:
-        # No network; fallback to hostname resolution.
+        # No route to the internet; look at the interfaces themselves.
+        ip = _interface_ipv4(sock)
+        if ip:
+            return ip
+        # Fallback to hostname resolution.
         return socket.gethostbyname(socket.gethostname())
     finally:
         sock.close()
+
+
+def _interface_ipv4(sock: socket.socket) -> Optional[str]:
+    """Return the IPv4 address of the first non-loopback interface.
+    
+    Reason: Without a default route (offline LAN), hostname resolution
+    often yields 127.0.1.1 on Linux. SIOCGIFADDR asks the kernel for each
+    interface's address directly. None where unsupported (no fcntl on
+    Windows; the request number is Linux's, so the ioctl fails elsewhere)
+    or when no interface has one.
+    """
+    if fcntl is None or not hasattr(socket, "if_nameindex"):
+        return None
+    try:
+        interfaces = socket.if_nameindex()
+    except OSError:
+        return None
+    for _index, name in interfaces:
+        try:
+            # struct ifreq: 16-byte name, then the sockaddr_in filled in.
+            ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, name.encode()[:15].ljust(40, b"\0"))
+        except OSError:
+            # Interface has no IPv4 address (or the ioctl is unsupported).
+            continue
+        ip = socket.inet_ntoa(ifreq[20:24])
+        if not ip.startswith("127."):
+            return ip
+    return None